@@ -0,0 +1,69 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+import pygame
+from constants import ASSET_PATH, SPRITE_CACHE_PATH, TILE_SIZE
+
+# Sprite name -> source image. Players are ('player', symbol, facing), drawn facing the given side.
+SPRITE_FILES = {'coin': "coin.png", 'obstacle': "obstacle.png", 'magnet': "magnet.png", 'ghost': "ghost.png"}
+PLAYER_FILES = {'A': ("player1.png", 'right'), 'B': ("player2.png", 'left')}
+MUSIC_FILE = "pookatori-and-friends-kevin-macleod-main-version-24903-04-07.mp3"
+
+class SpriteLoader:
+    # Decodes the full-size PNGs and scales them to the tile size on a background thread.
+    # Scaled pixels are kept on disk, keyed by the source's mtime and the tile size, so
+    # later starts read a few KB per sprite instead of decoding megabytes of PNG.
+    def __init__(self, asset_path=ASSET_PATH, cache_path=SPRITE_CACHE_PATH, tile_size=TILE_SIZE):
+        self.asset_path = asset_path
+        self.cache_path = cache_path
+        self.tile_size = tile_size
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="assets")
+        self.pending = {}
+
+    def prefetch(self, filenames, tile_size=None):
+        # Queued in order, so pass what the first frame needs first
+        tile_size = tile_size or self.tile_size
+        for filename in filenames:
+            if (filename, tile_size) not in self.pending:
+                self.pending[filename, tile_size] = self.executor.submit(self.load_scaled, filename, tile_size)
+
+    def get(self, filename, tile_size=None):
+        # The scaled sprite, waiting for the background load if it hasn't finished
+        tile_size = tile_size or self.tile_size
+        self.prefetch([filename], tile_size)
+        return self.pending[filename, tile_size].result()
+
+    def cache_file(self, filename, tile_size):
+        source = os.path.join(self.asset_path, filename)
+        stem = os.path.splitext(filename)[0]
+        return os.path.join(self.cache_path, f"{stem}-{tile_size}-{os.stat(source).st_mtime_ns}.rgba")
+
+    def load_scaled(self, filename, tile_size):
+        size = (tile_size, tile_size)
+        cached = self.cache_file(filename, tile_size)
+        try:
+            with open(cached, 'rb') as f:
+                return pygame.image.frombytes(f.read(), size, 'RGBA')
+        except (OSError, ValueError):
+            # Not cached yet, or a truncated file from an interrupted write
+            pass
+        surface = pygame.transform.smoothscale(pygame.image.load(os.path.join(self.asset_path, filename)), size)
+        self.store(cached, surface)
+        return surface
+
+    def store(self, cached, surface):
+        # Older copies of the same sprite and tile size are stale once the source changed
+        prefix = os.path.basename(cached).rsplit('-', 1)[0] + '-'
+        try:
+            os.makedirs(self.cache_path, exist_ok=True)
+            for name in os.listdir(self.cache_path):
+                if name.startswith(prefix):
+                    os.remove(os.path.join(self.cache_path, name))
+            with open(cached + '.tmp', 'wb') as f:
+                f.write(pygame.image.tobytes(surface, 'RGBA'))
+            os.replace(cached + '.tmp', cached)
+        except OSError:
+            # A read-only checkout still runs, it just scales the PNGs every start
+            pass
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
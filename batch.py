@@ -0,0 +1,349 @@
+import argparse
+import time
+import numpy as np
+from board import Board, board_size_arg, EMPTY, OBSTACLE, COIN, MAGNET, STEPS, NO_HOP
+from constants import BOARD_SIZE, HEADLESS_TURN_TIME, INVULNERABLE_TIME, MAX_TURNS
+from entities import AIPlayer, RandomPlayer
+from simulation import Simulation, StepClock, match_generators
+
+# Batch engine stand-ins for the scalar player types
+GREEDY = 'ai'
+RANDOM = 'random'
+
+STEP_ARRAY = np.array(STEPS)
+FAR = 1 << 14  # distance of tiles that can't reach a target, fits the int16 fields
+NO_MOVE = -1
+
+def setup_match(seed, board_size, player_types):
+    # The scalar match run_match would start from, so a seed means the same board and ghost
+    rng, player_rngs = match_generators(seed)
+    board = Board(board_size, rng=rng)
+    player_a = player_types[0]('A', 0, 0, rng=player_rngs[0])
+    player_b = player_types[1]('B', board_size - 1, board_size - 1, rng=player_rngs[1])
+    return Simulation([player_a, player_b], board, StepClock(HEADLESS_TURN_TIME), rng)
+
+class BatchSimulation:
+    # N headless matches stepped together, one turn for every game per step().
+    # Follows Player.move, Ghost.move and Simulation.handle_ghost_collision, with the
+    # same StepClock timing as headless.run_match; randomness comes from numpy instead.
+    def __init__(self, sims, seed=None):
+        size = sims[0].board.size
+        self.size = size
+        self.count = n = len(sims)
+        self.rng = np.random.default_rng(seed)
+        self.games = np.arange(n)
+        self.grid = np.stack([np.frombuffer(bytes(sim.board.grid), dtype=np.uint8).reshape(size, size)
+                              for sim in sims])
+        self.walls = self.grid == OBSTACLE
+        # Cached greedy distance fields per target, rebuilt for games whose items changed
+        self.fields = {}
+        self.stale = {COIN: np.ones(n, dtype=bool), MAGNET: np.ones(n, dtype=bool)}
+        self.pos = np.array([[p.position for p in sim.players] for sim in sims])  # (n, player, xy)
+        self.spawn = np.array([[sim.spawn_position(p) for p in sim.players] for sim in sims])
+        self.score = np.array([[p.score for p in sim.players] for sim in sims])
+        self.lives = np.array([[p.lives for p in sim.players] for sim in sims])
+        self.magnet_left = np.array([[p.magnet_moves_left if p.magnet_active else 0 for p in sim.players]
+                                     for sim in sims])
+        self.radius = np.array([[p.magnet_radius for p in sim.players] for sim in sims])
+        self.ghost = np.array([(sim.ghost.x, sim.ghost.y) for sim in sims])
+        self.ghost_counter = np.array([sim.ghost.moves_counter for sim in sims])
+        self.ghost_target = np.array([sim.ghost.target_player for sim in sims])
+        self.move_delay = sims[0].ghost.move_delay
+        self.invulnerable = np.array([sim.player_index(sim.invulnerable_player) for sim in sims])
+        self.invulnerable_time = np.array([sim.invulnerable_time for sim in sims])
+        self.losing = np.array([sim.player_index(sim.losing_player) for sim in sims])
+        self.current = np.array([sim.current_player for sim in sims])
+        self.turns = np.array([sim.turns for sim in sims])
+        self.clock = sims[0].clock.now()  # every game shares the lockstep clock
+        self.active = np.ones(n, dtype=bool)
+        self.stranded = np.zeros(n, dtype=bool)  # games whose ghost had no route on the last step
+        self.update_finished()
+
+    def coins_left(self):
+        return (self.grid == COIN).sum(axis=(1, 2))
+
+    def update_finished(self):
+        # Simulation.check_game_end for every game, finished games stop taking turns
+        dead = self.lives <= 0
+        no_coins = self.coins_left() == 0
+        # With coins left, the first player found without lives is the loser
+        blamed = self.active & ~no_coins & dead.any(axis=1)
+        self.losing[blamed] = np.where(dead[blamed, 0], 0, 1)
+        self.active &= ~(dead.any(axis=1) | no_coins)
+
+    def winners(self):
+        # Simulation.winner per game: 0, 1, or -1 for a tie
+        winner = np.where(self.score[:, 0] > self.score[:, 1], 0, np.where(self.score[:, 0] < self.score[:, 1], 1, -1))
+        return np.where(self.losing >= 0, 1 - self.losing, winner)
+
+    def targets(self, moves, who=None):
+        # Destination (x, y) of each game's move for player who, and whether it is legal
+        who = self.current if who is None else who
+        dest = self.pos[self.games, who] + STEP_ARRAY[np.maximum(moves, 0)]
+        inside = ((dest >= 0) & (dest < self.size)).all(axis=1) & (moves != NO_MOVE)
+        x = np.clip(dest[:, 0], 0, self.size - 1)
+        y = np.clip(dest[:, 1], 0, self.size - 1)
+        legal = inside & ~self.walls[self.games, x, y]
+        return x, y, legal
+
+    def legal_moves(self):
+        # (n, 4) mask of moves the current player can make, in STEPS order
+        dest = self.pos[self.games, self.current][:, None, :] + STEP_ARRAY
+        inside = ((dest >= 0) & (dest < self.size)).all(axis=2)
+        dest = np.clip(dest, 0, self.size - 1)
+        return inside & ~self.walls[self.games[:, None], dest[..., 0], dest[..., 1]]
+
+    def step(self, moves, ghost_targets=None):
+        # One turn in every unfinished game. moves holds a STEPS index or NO_MOVE per game,
+        # ghost_targets optionally fixes who each stepping ghost chases instead of rolling
+        games = self.games
+        self.clock += HEADLESS_TURN_TIME
+        # Simulation.tick
+        expired = (self.invulnerable >= 0) & (self.clock - self.invulnerable_time > INVULNERABLE_TIME)
+        self.invulnerable[expired] = -1
+
+        x, y, legal = self.targets(moves)
+        moving = self.active & legal
+        who = self.current
+
+        # Player.move: step, magnet pickup, coin pickup, magnet radius collection
+        self.pos[moving, who[moving]] = np.stack([x, y], axis=1)[moving]
+        tile = self.grid[games, x, y]
+        magnet = moving & (tile == MAGNET)
+        coin = moving & (tile == COIN)
+        self.magnet_left[magnet, who[magnet]] = 3
+        self.score[coin, who[coin]] += 1
+        self.grid[games[magnet | coin], x[magnet | coin], y[magnet | coin]] = EMPTY
+        self.stale[MAGNET] |= magnet
+        self.stale[COIN] |= coin
+
+        pulling = moving & (self.magnet_left[games, who] > 0)
+        pull = games[pulling]
+        if len(pull):
+            # Only the few games with a magnet on, most turns have none
+            px, py, pwho = x[pull], y[pull], who[pull]
+            radius = self.radius[pull, pwho]
+            for dx in range(-radius.max(), radius.max() + 1):
+                for dy in range(-radius.max(), radius.max() + 1):
+                    cx, cy = px + dx, py + dy
+                    hit = ((abs(dx) <= radius) & (abs(dy) <= radius) &
+                           (cx >= 0) & (cx < self.size) & (cy >= 0) & (cy < self.size))
+                    cx, cy = np.clip(cx, 0, self.size - 1), np.clip(cy, 0, self.size - 1)
+                    hit &= self.grid[pull, cx, cy] == COIN
+                    self.score[pull[hit], pwho[hit]] += 1
+                    self.grid[pull[hit], cx[hit], cy[hit]] = EMPTY
+                    self.stale[COIN][pull[hit]] = True
+            self.magnet_left[pull, pwho] -= 1
+
+        self.ghost_step(moving, ghost_targets)
+        self.collide(moving)
+
+        # A player with nowhere to go hands the turn over, as in headless.run_match
+        turned = self.active.copy()
+        self.current[turned] = 1 - self.current[turned]
+        self.turns[turned] += 1
+        self.update_finished()
+
+    def ghost_step(self, moving, ghost_targets):
+        # Ghost.move: every move_delay-th turn it may retarget, then steps towards its target
+        games = self.games
+        self.ghost_counter[moving] += 1
+        stepping = moving & (self.ghost_counter >= self.move_delay)
+        self.ghost_counter[stepping] = 0
+        if ghost_targets is None:
+            retarget = stepping & (self.rng.random(self.count) < 0.3)
+            self.ghost_target[retarget] = self.rng.integers(0, 2, self.count)[retarget]
+        else:
+            self.ghost_target[stepping] = ghost_targets[stepping]
+
+        size = self.size
+        target = self.pos[games, self.ghost_target]
+        src = self.ghost[:, 0] * size + self.ghost[:, 1]
+        dst = target[:, 0] * size + target[:, 1]
+        hop = np.full(self.count, NO_HOP)
+        hop[stepping] = self.next_hops(games[stepping], dst[stepping], src[stepping])
+        routed = hop != NO_HOP
+        self.ghost[routed] += STEP_ARRAY[hop[routed]]
+        stranded = self.stranded = stepping & ~routed
+
+        # No route (or already there): nearest open neighbour by Manhattan distance, random ties
+        if stranded.any():
+            best = np.full(self.count, np.inf)
+            choice = np.full(self.count, NO_MOVE)
+            noise = self.rng.random((self.count, len(STEPS)))
+            for d, (dx, dy) in enumerate(STEPS):
+                nx, ny = self.ghost[:, 0] + dx, self.ghost[:, 1] + dy
+                inside = (nx >= 0) & (nx < size) & (ny >= 0) & (ny < size)
+                open_tile = inside & ~self.walls[games, np.clip(nx, 0, size - 1), np.clip(ny, 0, size - 1)]
+                dist = np.abs(nx - target[:, 0]) + np.abs(ny - target[:, 1]) + noise[:, d]
+                better = stranded & open_tile & (dist < best)
+                best[better] = dist[better]
+                choice[better] = d
+            stranded &= choice != NO_MOVE
+            self.ghost[stranded] += STEP_ARRAY[choice[stranded]]
+
+    def next_hops(self, games, dst, src):
+        # Board.next_hop_step for the given games: one BFS outwards from every dst at once, a level
+        # per pass, until it reaches src. Each level is kept in the scalar queue's order and a tile
+        # goes to the first tile before it in that order to reach it, so ties go the same way.
+        size = self.size
+        tiles = size * size
+        count = len(games)
+        hop = np.full(count, NO_HOP)
+        seen = self.walls[games].reshape(count, tiles).copy()
+        seen[np.arange(count), dst] = True
+        done = np.zeros(count, dtype=bool)
+        # The level being expanded as (game, tile) pairs in queue order, game by game
+        board = np.flatnonzero(src != dst)
+        tile = dst[board]
+        while len(board):
+            # Neighbours in the scalar order: up, down, left, right. key = 4 * queue place + side,
+            # and the step back towards the claiming tile is that side's STEPS index.
+            place = np.arange(len(board)) * 4
+            col = tile % size
+            sides = ((tile >= size, tile - size), (tile < tiles - size, tile + size),
+                     (col > 0, tile - 1), (col < size - 1, tile + 1))
+            next_board = np.concatenate([board[ok] for ok, _ in sides])
+            next_tile = np.concatenate([near[ok] for ok, near in sides])
+            key = np.concatenate([place[ok] + side for side, (ok, _) in enumerate(sides)])
+            fresh = ~seen[next_board, next_tile]
+            next_board, next_tile, key = next_board[fresh], next_tile[fresh], key[fresh]
+
+            # The first claim on each tile wins, and the new level keeps the claims' order
+            by_key = key.argsort()
+            claims = next_board[by_key] * tiles + next_tile[by_key]
+            first = np.sort(np.unique(claims, return_index=True)[1])
+            board, tile, key = next_board[by_key][first], next_tile[by_key][first], key[by_key][first]
+            seen[board, tile] = True
+
+            reached = tile == src[board]
+            hop[board[reached]] = key[reached] % 4 ^ 1
+            done[board[reached]] = True
+            keep = ~done[board]
+            board, tile = board[keep], tile[keep]
+        return hop
+
+    def collide(self, moving):
+        # Simulation.handle_ghost_collision for both players in turn
+        for p in range(2):
+            hit = moving & (self.pos[:, p] == self.ghost).all(axis=1) & (self.invulnerable != p)
+            self.lives[hit, p] -= 1
+            self.invulnerable[hit] = p
+            self.invulnerable_time[hit] = self.clock
+            self.pos[hit, p] = self.spawn[hit, p]
+            self.losing[hit & (self.lives[:, p] <= 0)] = p
+
+    def distance_fields(self, target, games):
+        # Board.distance_field for the given games, rebuilding those whose targets were taken
+        if target not in self.fields:
+            self.fields[target] = np.zeros(self.grid.shape, dtype=np.int16)
+        fields = self.fields[target]
+        stale = games[self.stale[target][games]]
+        if len(stale):
+            fields[stale] = self.compute_distance_fields(target, stale)
+            self.stale[target][stale] = False
+        return fields[games]
+
+    def compute_distance_fields(self, target, games):
+        # Multi-source BFS on every given board at once, one ring of (game, tile) pairs per pass
+        size = self.size
+        tiles = size * size
+        count = len(games)
+        fields = np.full((count, tiles), FAR, dtype=np.int16)
+        seen = self.walls[games].reshape(count, tiles).copy()
+        # Which of the pairs reaching a tile carries it into the next ring
+        owner = np.empty((count, tiles), dtype=np.intp)
+        board, tile = np.nonzero(self.grid[games].reshape(count, tiles) == target)
+        fields[board, tile] = 0
+        seen[board, tile] = True
+        dist = 0
+        while len(board):
+            dist += 1
+            col = tile % size
+            sides = ((tile >= size, tile - size), (tile < tiles - size, tile + size),
+                     (col > 0, tile - 1), (col < size - 1, tile + 1))
+            board = np.concatenate([board[ok] for ok, _ in sides])
+            tile = np.concatenate([near[ok] for ok, near in sides])
+            fresh = ~seen[board, tile]
+            board, tile = board[fresh], tile[fresh]
+            pairs = np.arange(len(board))
+            owner[board, tile] = pairs
+            first = owner[board, tile] == pairs
+            board, tile = board[first], tile[first]
+            seen[board, tile] = True
+            fields[board, tile] = dist
+        return fields.reshape(count, size, size)
+
+    def step_towards(self, field, games):
+        # AIPlayer.step_towards for the current players: downhill, first direction wins ties
+        size = self.size
+        rows = np.arange(len(games))
+        pos = self.pos[games, self.current[games]]
+        dist = np.full((len(games), len(STEPS)), FAR, dtype=np.int16)
+        for d, (dx, dy) in enumerate(STEPS):
+            nx, ny = pos[:, 0] + dx, pos[:, 1] + dy
+            inside = (nx >= 0) & (nx < size) & (ny >= 0) & (ny < size)
+            near = field[rows, np.clip(nx, 0, size - 1), np.clip(ny, 0, size - 1)]
+            dist[:, d] = np.where(inside, near, FAR)
+        move = dist.argmin(axis=1)
+        return np.where(dist[rows, move] < FAR, move, NO_MOVE)
+
+    def random_moves(self):
+        # RandomPlayer: uniform over the legal moves
+        legal = self.legal_moves()
+        pick = np.where(legal, self.rng.random(legal.shape), -1.0).argmax(axis=1)
+        return np.where(legal.any(axis=1), pick, NO_MOVE)
+
+    def greedy_moves(self, games, fallback):
+        # AIPlayer.get_move for the given games: magnet while none is active, else coins,
+        # else the fallback move
+        moves = fallback
+        coin_moves = self.step_towards(self.distance_fields(COIN, games), games)
+        moves = np.where(coin_moves != NO_MOVE, coin_moves, moves)
+        magnet_moves = self.step_towards(self.distance_fields(MAGNET, games), games)
+        use_magnet = (self.magnet_left[games, self.current[games]] == 0) & (magnet_moves != NO_MOVE)
+        return np.where(use_magnet, magnet_moves, moves)
+
+    def policy_moves(self, policies):
+        moves = self.random_moves()
+        greedy = np.flatnonzero(self.active & (np.array([policy == GREEDY for policy in policies])[self.current]))
+        if len(greedy):
+            moves[greedy] = self.greedy_moves(greedy, moves[greedy])
+        return moves
+
+    def run(self, policies, max_turns=MAX_TURNS):
+        while self.active.any():
+            self.active &= self.turns < max_turns
+            if not self.active.any():
+                break
+            self.step(self.policy_moves(policies))
+        return self.winners()
+
+def run_batch(policies=(GREEDY, GREEDY), games=1000, board_size=BOARD_SIZE, max_turns=MAX_TURNS, first_seed=0):
+    player_types = [AIPlayer if policy == GREEDY else RandomPlayer for policy in policies]
+    sims = [setup_match(seed, board_size, player_types) for seed in range(first_seed, first_seed + games)]
+    batch = BatchSimulation(sims, first_seed)
+    winners = batch.run(policies, max_turns)
+    return batch, winners
+
+def main():
+    parser = argparse.ArgumentParser(description="Play many headless matches in lockstep with NumPy")
+    parser.add_argument("--players", nargs=2, choices=[GREEDY, RANDOM], default=[GREEDY, GREEDY])
+    parser.add_argument("--games", type=int, default=1000)
+    parser.add_argument("--size", type=board_size_arg, default=BOARD_SIZE)
+    parser.add_argument("--max-turns", type=int, default=MAX_TURNS)
+    parser.add_argument("--first-seed", type=int, default=0)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    batch, winners = run_batch(args.players, args.games, args.size, args.max_turns, args.first_seed)
+    elapsed = time.perf_counter() - start
+
+    print(f"Player A wins: {(winners == 0).sum()}  Player B wins: {(winners == 1).sum()}  "
+          f"Ties: {(winners == -1).sum()}")
+    print(f"Average score {batch.score.mean(axis=0).round(2)}  lives {batch.lives.mean(axis=0).round(2)}  "
+          f"turns {batch.turns.mean():.1f}")
+    print(f"{args.games} matches in {elapsed:.2f}s ({args.games / elapsed:.1f} matches/s)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,801 @@
+import argparse
+import copy
+import functools
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import deque
+from board import Board, Coin, Magnet, EMPTY, COIN, MAGNET
+from constants import HEADLESS_TURN_TIME, NEXT_HOP_TABLE_MAX_TILES, TILE_SIZE
+from entities import AIPlayer, MCTSPlayer, RandomPlayer, SearchPlayer
+from headless import run_match
+from profiler import Profiler
+from search import SearchState
+from simulation import Simulation, StepClock
+
+class OpenBoard(Board):
+    # Board without walls, so nearly every tile can hold a coin
+    def generate_obstacles(self, obstacle_prob):
+        pass
+
+class TimedRepairBoard(Board):
+    # Board that accumulates the time spent repairing distance fields
+    repair_time = 0.0
+
+    def _repair_distance_field(self, field, removed):
+        start = time.perf_counter()
+        super()._repair_distance_field(field, removed)
+        self.repair_time += time.perf_counter() - start
+
+class DictCoin:
+    # Coin as it was before __slots__
+    def __init__(self, x, y, value=1):
+        self.x = x
+        self.y = y
+        self.value = value
+
+class CountingSearchPlayer(SearchPlayer):
+    # SearchPlayer that totals depth, nodes and time over every move it searches
+    moves = 0
+    depth = 0
+    nodes = 0
+    search_time = 0.0
+
+    def search_move(self, sim, request):
+        start = time.perf_counter()
+        super().search_move(sim, request)
+        cls = CountingSearchPlayer
+        cls.search_time += time.perf_counter() - start
+        cls.moves += 1
+        cls.depth += self.last_search.depth
+        cls.nodes += self.last_search.nodes
+
+class CountingMCTSPlayer(MCTSPlayer):
+    # MCTSPlayer that totals playouts and search time across every instance
+    playouts_total = 0
+    time_total = 0.0
+
+    def search_move(self, sim, request):
+        playouts, search_time = self.playouts, self.search_time
+        super().search_move(sim, request)
+        CountingMCTSPlayer.playouts_total += self.playouts - playouts
+        CountingMCTSPlayer.time_total += self.search_time - search_time
+
+def legacy_generate(size, rng, coin_prob=0.5, magnet_prob=0.1, obstacle_prob=0.85):
+    # List-based board generation as it was before the tile grid
+    obstacles = []
+    for i in range(1, (size + 1) // 2, 2):
+        for j in range(i, (size + 1) // 2):
+            obstacles.append((i, j))
+            obstacles.append((size - i - 1, size - j - 1))
+            obstacles.append((i, size - j - 1))
+            obstacles.append((size - i - 1, j))
+    for i in range(1, (size + 1) // 2, 2):
+        for j in range(i, (size + 1) // 2):
+            obstacles.append((j, i))
+            obstacles.append((size - j - 1, size - i - 1))
+            obstacles.append((j, size - i - 1))
+            obstacles.append((size - j - 1, i))
+
+    removed = []
+    middle_tile = (size + 1) // 2 if size % 2 == 0 else size // 2
+    for i in obstacles[:]:
+        if i[0] == middle_tile or i[1] == middle_tile:
+            obstacles.remove(i)
+            removed.append(i)
+        elif rng.random() < 1 - obstacle_prob:
+            obstacles.remove(i)
+    for i in range(min(1, len(removed))):
+        selected = rng.choice(removed)
+        obstacles.append(selected)
+        removed.remove(selected)
+    obstacles = list(set(obstacles))
+    obstacles = [pos for pos in obstacles if pos[0] != 0 and pos[0] != size - 1 and pos[1] != 0 and pos[1] != size - 1]
+
+    coins = []
+    magnets = []
+    for i in range(size):
+        for j in range(size):
+            if (i, j) in obstacles or (i, j) in [(0, 0), (size - 1, size - 1)]:
+                continue
+            rand_val = rng.random()
+            if rand_val < magnet_prob:
+                magnets.append(Magnet(i, j))
+            elif rand_val < coin_prob + magnet_prob:
+                coins.append(Coin(i, j))
+    return obstacles, coins, magnets
+
+def legacy_collect_coins_in_radius(coins, center_x, center_y, radius):
+    # List-based collection as it was before Board had a tile grid
+    collected = []
+    for coin in list(coins):
+        dx = abs(coin.x - center_x)
+        dy = abs(coin.y - center_y)
+        if dx <= radius and dy <= radius:
+            collected.append(coin)
+            coins.remove(coin)
+    return collected
+
+def legacy_bfs_move(board, start, target_types):
+    # Path-copying BFS as AIPlayer.get_move used to run it
+    visited = set()
+    queue = deque([(start, [])])
+    while queue:
+        (x, y), path = queue.popleft()
+        if (x, y) in visited:
+            continue
+        visited.add((x, y))
+
+        found = False
+        if 'coin' in target_types and board.is_coin(x, y) and (x, y) != start:
+            found = True
+        if 'magnet' in target_types and board.is_magnet(x, y) and (x, y) != start:
+            found = True
+
+        if found:
+            return path[0] if path else None
+
+        for direction, (dx, dy) in {
+            'up': (-1, 0), 'down': (1, 0),
+            'left': (0, -1), 'right': (0, 1)
+        }.items():
+            nx, ny = x + dx, y + dy
+            if 0 <= nx < board.size and 0 <= ny < board.size and not board.is_obstacle(nx, ny):
+                queue.append(((nx, ny), path + [direction]))
+    return None
+
+def bench_bfs(sizes, seeds, starts):
+    print(f"AI search, {seeds} seeded boards x {starts} start tiles per size")
+    for size in sizes:
+        legacy_time = 0.0
+        field_time = 0.0
+        descent_time = 0.0
+        searches = 0
+        for seed in range(seeds):
+            rng = random.Random(seed)
+            board = Board(size, coin_prob=0.005, magnet_prob=0.001, rng=rng)
+            # Items are picked up on arrival, so a player only ever stands on an empty tile
+            free = [(x, y) for x in range(size) for y in range(size) if board.tile(x, y) == EMPTY]
+            player = AIPlayer('B', 0, 0, rng)
+            for position in rng.sample(free, min(starts, len(free))):
+                player.position = position
+                for target, name in ((COIN, 'coin'), (MAGNET, 'magnet')):
+                    start = time.perf_counter()
+                    legacy_bfs_move(board, position, [name])
+                    legacy_time += time.perf_counter() - start
+
+                    start = time.perf_counter()
+                    board._fields.pop(target, None)
+                    board.distance_field(target)
+                    field_time += time.perf_counter() - start
+
+                    start = time.perf_counter()
+                    player.step_towards(board, target)
+                    descent_time += time.perf_counter() - start
+                    searches += 1
+        print(f"  {size}x{size}: path-copying BFS {legacy_time / searches * 1e6:9.1f} us   "
+              f"field rebuild {field_time / searches * 1e6:8.1f} us   "
+              f"descent {descent_time / searches * 1e6:6.1f} us   "
+              f"({searches} moves)")
+
+def bench_fields(sizes, games, max_turns):
+    print(f"Distance field upkeep, {games} random games per size, rebuilt after every move to compare")
+    for size in sizes:
+        repair_time = 0.0
+        rebuild_time = 0.0
+        moves = 0
+        for seed in range(games):
+            rng = random.Random(seed)
+            board = TimedRepairBoard(size, rng=rng)
+            players = [AIPlayer('A', 0, 0, rng), AIPlayer('B', size - 1, size - 1, rng)]
+            clock = StepClock(HEADLESS_TURN_TIME)
+            sim = Simulation(players, board, clock, rng)
+            while not sim.check_game_end() and sim.turns < max_turns:
+                clock.advance()
+                sim.tick()
+                player = sim.players[sim.current_player]
+                # Mix in random moves so the players don't only eat the nearest coin
+                move = player.get_move(board) if rng.random() < 0.8 else rng.choice(player.available_moves(board) or [None])
+                if not sim.step(move):
+                    sim.current_player = 1 - sim.current_player
+                    continue
+                moves += 1
+                for target in (COIN, MAGNET):
+                    start = time.perf_counter()
+                    board.compute_distance_field(target)
+                    rebuild_time += time.perf_counter() - start
+            repair_time += board.repair_time
+        print(f"  {size}x{size}: incremental repair {repair_time / moves * 1e6:8.1f} us/move   "
+              f"full rebuild {rebuild_time / moves * 1e6:8.1f} us/move   ({moves} moves)")
+
+def bench_ghost(sizes, queries):
+    print(f"Ghost next hop, {queries} random queries per size")
+    for size in sizes:
+        rng = random.Random(size)
+        board = Board(size, rng=rng)
+        free = [(x, y) for x in range(size) for y in range(size) if not board.is_obstacle(x, y)]
+        pairs = [(rng.choice(free), rng.choice(free)) for _ in range(queries)]
+
+        table = board.next_hops
+        board.next_hops = None
+        start = time.perf_counter()
+        for (sx, sy), (tx, ty) in pairs:
+            board.next_hop(sx, sy, tx, ty)
+        search_time = time.perf_counter() - start
+
+        if table is None:
+            print(f"  {size}x{size}: no table (over {NEXT_HOP_TABLE_MAX_TILES} tiles)   "
+                  f"BFS {search_time / queries * 1e6:8.1f} us/move")
+            continue
+
+        board.next_hops = table
+        start = time.perf_counter()
+        for (sx, sy), (tx, ty) in pairs:
+            board.next_hop(sx, sy, tx, ty)
+        first_time = time.perf_counter() - start
+        start = time.perf_counter()
+        for (sx, sy), (tx, ty) in pairs:
+            board.next_hop(sx, sy, tx, ty)
+        table_time = time.perf_counter() - start
+        print(f"  {size}x{size}: table {len(table) / 1024:6.1f} KB   "
+              f"cold {first_time / queries * 1e6:6.1f} us/move   warm {table_time / queries * 1e6:5.2f} us/move   "
+              f"BFS {search_time / queries * 1e6:8.1f} us/move")
+
+def bench_generate(sizes, legacy_max, repeats):
+    print(f"Board generation, best of {repeats}")
+    for size in sizes:
+        grid_time = float('inf')
+        for seed in range(repeats):
+            start = time.perf_counter()
+            Board(size, rng=random.Random(seed))
+            grid_time = min(grid_time, time.perf_counter() - start)
+        line = f"  {size}x{size}: grid {grid_time * 1000:8.1f} ms"
+        if size <= legacy_max:
+            start = time.perf_counter()
+            legacy_generate(size, random.Random(repeats - 1))
+            legacy_time = time.perf_counter() - start
+            line += f"   lists {legacy_time * 1000:10.1f} ms"
+        print(line)
+
+def sprite_cache(sprite):
+    from cache import SurfaceCache
+    cache = SurfaceCache()
+    for name in ("coin", "obstacle", "magnet", "ghost"):
+        cache.add_sprite(name, sprite)
+    cache.add_player('A', sprite, 'right')
+    cache.add_player('B', sprite, 'left')
+    return cache
+
+def legacy_draw_items(board, screen, coin_img, magnet_img, obstacle_img):
+    # One Python-level blit per item, as the board was drawn before the atlas
+    for (x, y) in board.obstacles:
+        screen.blit(obstacle_img, (y * TILE_SIZE, x * TILE_SIZE))
+    for coin in board.coins.values():
+        screen.blit(coin_img, (coin.y * TILE_SIZE, coin.x * TILE_SIZE))
+    for magnet in board.magnets.values():
+        screen.blit(magnet_img, (magnet.y * TILE_SIZE, magnet.x * TILE_SIZE))
+
+def bench_atlas(sizes, repeats):
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    import pygame
+    from camera import Camera
+    pygame.init()
+    pygame.display.set_mode((1, 1))
+    print(f"Obstacles, coins and magnets drawn from the atlas against one blit each, best of {repeats}")
+    for size in sizes:
+        sprites = []
+        for color in ((200, 150, 0, 255), (90, 90, 90, 255), (200, 0, 200, 160)):
+            sprite = pygame.Surface((TILE_SIZE, TILE_SIZE), pygame.SRCALPHA)
+            pygame.draw.circle(sprite, color, (TILE_SIZE // 2, TILE_SIZE // 2), TILE_SIZE // 3)
+            sprites.append(sprite.convert_alpha())
+        coin, obstacle, magnet = sprites
+        cache = sprite_cache(coin)
+        cache.add_sprite('obstacle', obstacle)
+        cache.add_sprite('magnet', magnet)
+        atlas = cache.atlas()
+        board = Board(size, rng=random.Random(size))
+        camera = Camera(size * TILE_SIZE, size * TILE_SIZE, size)
+        items = len(board.obstacles) + len(board.coins) + len(board.magnets)
+
+        screen = pygame.Surface((size * TILE_SIZE, size * TILE_SIZE)).convert()
+        legacy = []
+        batched = []
+        for _ in range(repeats):
+            screen.fill((255, 255, 255))
+            start = time.perf_counter()
+            legacy_draw_items(board, screen, coin, magnet, obstacle)
+            legacy.append(time.perf_counter() - start)
+
+            screen.fill((255, 255, 255))
+            start = time.perf_counter()
+            screen.blits([(atlas.surface, (y * TILE_SIZE, x * TILE_SIZE), atlas.areas['obstacle'])
+                          for (x, y) in board.obstacles], False)
+            board.draw(screen, atlas, camera)
+            batched.append(time.perf_counter() - start)
+        print(f"  {size}x{size} ({items} items): one blit each {min(legacy) * 1000:8.2f} ms   "
+              f"atlas blits {min(batched) * 1000:8.2f} ms")
+    pygame.quit()
+
+def bench_render(sizes, frames):
+    # Imported here so the other benchmarks don't need a display
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    import pygame
+    from constants import TILE_SIZE, HUD_HEIGHT, WHITE
+    from renderer import Renderer
+
+    pygame.init()
+    print(f"Playing screen, {frames} frames per size")
+    for size in sizes:
+        screen = pygame.display.set_mode((size * TILE_SIZE, size * TILE_SIZE + HUD_HEIGHT))
+        sprite = pygame.Surface((TILE_SIZE, TILE_SIZE), pygame.SRCALPHA)
+        pygame.draw.circle(sprite, (200, 150, 0, 255), (TILE_SIZE // 2, TILE_SIZE // 2), TILE_SIZE // 3)
+        cache = sprite_cache(sprite)
+        renderer = Renderer(screen, pygame.font.Font(None, 24), cache)
+
+        rng = random.Random(size)
+        board = Board(size, rng=rng)
+        players = [AIPlayer('A', 0, 0, rng), AIPlayer('B', size - 1, size - 1, rng)]
+        sim = Simulation(players, board, StepClock(HEADLESS_TURN_TIME), rng)
+        renderer.reset(board)
+        renderer.draw(sim)
+
+        full_time = 0.0
+        dirty_time = 0.0
+        for _ in range(frames):
+            player = sim.players[sim.current_player]
+            if not sim.step(player.get_move(board)):
+                sim.current_player = 1 - sim.current_player
+
+            start = time.perf_counter()
+            pygame.display.update(renderer.draw(sim))
+            dirty_time += time.perf_counter() - start
+
+            # What every frame used to cost: clear, redraw everything, flip
+            start = time.perf_counter()
+            screen.fill(WHITE)
+            camera = renderer.camera
+            board.draw_static(screen, cache.atlas(), camera)
+            board.draw(screen, cache.atlas(), camera)
+            sim.ghost.draw(screen, cache.atlas(), camera)
+            for p in sim.players:
+                p.draw(screen, cache, camera)
+            pygame.display.flip()
+            full_time += time.perf_counter() - start
+            renderer.invalidate()
+            renderer.draw(sim)
+        print(f"  {size}x{size}: full redraw {full_time / frames * 1000:8.2f} ms/frame   "
+              f"dirty tiles {dirty_time / frames * 1000:6.2f} ms/frame")
+    pygame.quit()
+
+def bench_viewport(sizes, frames, view_tiles):
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    import pygame
+    from constants import HUD_HEIGHT
+    from renderer import Renderer
+
+    pygame.init()
+    screen = pygame.display.set_mode((view_tiles * TILE_SIZE, view_tiles * TILE_SIZE + HUD_HEIGHT))
+    print(f"Camera view of {view_tiles}x{view_tiles} tiles, {frames} frames per board, zooming every 10")
+    for size in sizes:
+        sprite = pygame.Surface((TILE_SIZE, TILE_SIZE), pygame.SRCALPHA)
+        pygame.draw.circle(sprite, (200, 150, 0, 255), (TILE_SIZE // 2, TILE_SIZE // 2), TILE_SIZE // 3)
+        cache = sprite_cache(sprite.convert_alpha())
+        renderer = Renderer(screen, pygame.font.Font(None, 24), cache)
+        rng = random.Random(size)
+        board = Board(size, rng=rng)
+        players = [AIPlayer('A', 0, 0, rng), AIPlayer('B', size - 1, size - 1, rng)]
+        sim = Simulation(players, board, StepClock(HEADLESS_TURN_TIME), rng)
+        # Followed like the human against the AI
+        renderer.reset(board, players[0])
+        renderer.draw(sim)
+
+        full_time = 0.0
+        dirty_time = 0.0
+        for frame in range(frames):
+            if frame % 10 == 9:
+                renderer.zoom(rng.choice((-1, 1)))
+            player = sim.players[sim.current_player]
+            if not sim.step(player.get_move(board)):
+                sim.current_player = 1 - sim.current_player
+
+            start = time.perf_counter()
+            renderer.draw(sim)
+            dirty_time += time.perf_counter() - start
+
+            renderer.invalidate()
+            start = time.perf_counter()
+            renderer.draw(sim)
+            full_time += time.perf_counter() - start
+        print(f"  {size}x{size}: full view {full_time / frames * 1000:6.2f} ms/frame   "
+              f"dirty tiles {dirty_time / frames * 1000:6.2f} ms/frame")
+    pygame.quit()
+
+def bench_magnet(sizes, pickups, radius):
+    print(f"Magnet collection, radius {radius}, {pickups} pickups per board")
+    for size in sizes:
+        rng = random.Random(size)
+        board = OpenBoard(size, coin_prob=0.9, magnet_prob=0.0, rng=rng)
+        coins = [Coin(c.x, c.y) for c in board.coins.values()]
+        centers = [(rng.randrange(size), rng.randrange(size)) for _ in range(pickups)]
+
+        start = time.perf_counter()
+        for x, y in centers:
+            legacy_collect_coins_in_radius(coins, x, y, radius)
+        legacy_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for x, y in centers:
+            board.collect_coins_in_radius(x, y, radius)
+        grid_time = time.perf_counter() - start
+        print(f"  {size}x{size}: list {legacy_time / pickups * 1e6:10.1f} us/pickup   "
+              f"grid {grid_time / pickups * 1e6:8.1f} us/pickup   "
+              f"({legacy_time / grid_time:.0f}x)")
+
+def scan_items(board, target, top, bottom, left, right):
+    # Tiles of type target in a region, found by scanning its grid rows
+    size = board.size
+    found = []
+    for x in range(top, bottom):
+        row = x * size
+        idx = board.grid.find(target, row + left, row + right)
+        while idx != -1:
+            found.append((x, idx - row))
+            idx = board.grid.find(target, idx + 1, row + right)
+    return found
+
+def bench_spatial(sizes, queries, view):
+    print(f"Chunked item index against grid scans, {queries} queries on {view}x{view} regions")
+    for size in sizes:
+        # Queries on a board part-way through a match, most of its chunks still holding coins,
+        # and on one nearly cleared out, where whole chunks are skipped
+        for label, keep in (("full", 1.0), ("sparse", 0.02)):
+            rng = random.Random(size)
+            board = Board(size, rng=rng)
+            for x, y in list(board.coins):
+                if rng.random() >= keep:
+                    board.remove_coin(x, y)
+            # Built ahead, a match pays for it once; None below SPATIAL_INDEX_MIN_SIZE
+            indexed_board = board.spatial_index() is not None
+            regions = []
+            for _ in range(queries):
+                top, left = rng.randrange(max(1, size - view)), rng.randrange(max(1, size - view))
+                regions.append((top, min(size, top + view), left, min(size, left + view)))
+
+            start = time.perf_counter()
+            for region in regions:
+                scan_items(board, COIN, *region)
+            scan_time = time.perf_counter() - start
+
+            start = time.perf_counter()
+            for region in regions:
+                board.items_in(COIN, *region)
+            index_time = time.perf_counter() - start
+            print(f"  {size}x{size} {label:6} ({board.coins_left():6d} coins): grid scans "
+                  f"{scan_time / queries * 1e6:9.1f} us/query   {'index' if indexed_board else 'board'} "
+                  f"{index_time / queries * 1e6:8.1f} us/query   ({scan_time / index_time:.1f}x)")
+
+def bench_search(budgets, games, size):
+    print(f"Search AI against the greedy AI, {games} seeds per budget in both seats, {size}x{size}")
+    for budget in budgets:
+        player = functools.partial(CountingSearchPlayer, budget_ms=budget)
+        CountingSearchPlayer.moves = CountingSearchPlayer.depth = CountingSearchPlayer.nodes = 0
+        CountingSearchPlayer.search_time = 0.0
+        record = [0, 0, 0]
+        for seed in range(games):
+            for seat, pairing in ((0, (player, AIPlayer)), (1, (AIPlayer, player))):
+                winner = run_match(pairing, size, seed=seed)['winner']
+                record[2 if winner is None else 0 if winner == seat else 1] += 1
+        stats = CountingSearchPlayer
+        print(f"  {budget:4d} ms: won {record[0]:3d} lost {record[1]:3d} tied {record[2]:3d}   "
+              f"depth {stats.depth / stats.moves:5.1f}   {stats.nodes / stats.search_time:8.0f} nodes/s")
+
+def bench_mcts(budgets, games, size, workers):
+    print(f"MCTS AI against the greedy AI, {games} seeds per budget in both seats, {size}x{size}, {workers} process(es)")
+    for budget in budgets:
+        player = functools.partial(CountingMCTSPlayer, budget_ms=budget, workers=workers)
+        CountingMCTSPlayer.playouts_total = 0
+        CountingMCTSPlayer.time_total = 0.0
+        record = [0, 0, 0]
+        moves = 0
+        for seed in range(games):
+            for seat, pairing in ((0, (player, AIPlayer)), (1, (AIPlayer, player))):
+                result = run_match(pairing, size, seed=seed)
+                winner = result['winner']
+                record[2 if winner is None else 0 if winner == seat else 1] += 1
+                moves += result['turns'] // 2
+        stats = CountingMCTSPlayer
+        print(f"  {budget:4d} ms: won {record[0]:3d} lost {record[1]:3d} tied {record[2]:3d}   "
+              f"{stats.playouts_total / max(moves, 1):7.0f} playouts/move   "
+              f"{stats.playouts_total / stats.time_total:7.0f} playouts/s")
+
+def bench_unmake(sizes, games, max_turns):
+    print(f"Exploring every move then rolling back, {games} games per size")
+    for size in sizes:
+        make_time = 0.0
+        copy_time = 0.0
+        explored = 0
+        for seed in range(games):
+            rng = random.Random(seed)
+            board = Board(size, rng=rng)
+            players = [AIPlayer('A', 0, 0, rng), AIPlayer('B', size - 1, size - 1, rng)]
+            clock = StepClock(HEADLESS_TURN_TIME)
+            sim = Simulation(players, board, clock, rng)
+            board.distance_field(COIN)
+            board.distance_field(MAGNET)
+            while not sim.check_game_end() and sim.turns < max_turns:
+                clock.advance()
+                sim.tick()
+                player = sim.players[sim.current_player]
+                for move in player.available_moves(board):
+                    start = time.perf_counter()
+                    undo = sim.make_move(move)
+                    sim.unmake(undo)
+                    make_time += time.perf_counter() - start
+
+                    start = time.perf_counter()
+                    copy.deepcopy(sim).step(move)
+                    copy_time += time.perf_counter() - start
+                    explored += 1
+                if not sim.step(player.get_move(board)):
+                    sim.current_player = 1 - sim.current_player
+        print(f"  {size}x{size}: make + unmake {make_time / explored * 1e6:7.1f} us   "
+              f"deepcopy + step {copy_time / explored * 1e6:8.1f} us   ({explored} moves)")
+
+def allocated(build):
+    # Bytes still allocated after build() returns, and what it built
+    tracemalloc.start()
+    result = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return size, result
+
+def bench_memory(sizes, count):
+    print(f"Memory per entity ({count} each) and per match state")
+    for name, cls in (("dict Coin", DictCoin), ("slotted Coin", Coin)):
+        size, _ = allocated(lambda: [cls(i, i) for i in range(count)])
+        print(f"  {name:12s} {size / count:6.1f} B")
+    for size in sizes:
+        rng = random.Random(size)
+        board = Board(size, rng=rng)
+        players = [AIPlayer('A', 0, 0, rng), AIPlayer('B', size - 1, size - 1, rng)]
+        sim = Simulation(players, board, StepClock(HEADLESS_TURN_TIME), rng)
+        copied, _ = allocated(lambda: copy.deepcopy(sim))
+        SearchState(sim)  # builds the shared Zobrist keys outside the measurement
+        state, _ = allocated(lambda: SearchState(sim))
+        packed = sim.pack()
+
+        start = time.perf_counter()
+        for _ in range(100):
+            copy.deepcopy(sim)
+        copy_time = (time.perf_counter() - start) / 100
+        start = time.perf_counter()
+        for _ in range(100):
+            restored = bytes(packed)
+            hash(restored)
+        pack_time = (time.perf_counter() - start) / 100
+
+        print(f"  {size}x{size} ({len(board.coins)} coins): deepcopy {copied / 1024:8.1f} KB {copy_time * 1e6:9.1f} us   "
+              f"SearchState {state / 1024:7.1f} KB   "
+              f"packed {sys.getsizeof(packed) / 1024:6.1f} KB {pack_time * 1e6:6.1f} us to copy and hash")
+
+def bench_batch(sizes, games, max_turns):
+    from batch import GREEDY, RANDOM, run_batch
+    policies = {GREEDY: AIPlayer, RANDOM: RandomPlayer}
+    print(f"Lockstep NumPy batch against scalar matches, {games} games per pairing")
+    for size in sizes:
+        for pairing in ((GREEDY, GREEDY), (RANDOM, RANDOM), (GREEDY, RANDOM)):
+            player_types = [policies[name] for name in pairing]
+            start = time.perf_counter()
+            for seed in range(games):
+                run_match(player_types, size, max_turns, seed)
+            scalar_time = time.perf_counter() - start
+            start = time.perf_counter()
+            run_batch(pairing, games, size, max_turns)
+            batch_time = time.perf_counter() - start
+
+            print(f"  {size:3d}x{size:<3d} {pairing[0]:>6} vs {pairing[1]:<6}: scalar {games / scalar_time:7.1f} games/s   "
+                  f"batch {games / batch_time:7.1f} games/s ({scalar_time / batch_time:.1f}x)")
+
+def bench_profile(sizes, games, max_turns):
+    # Same matches with and without the hot paths wrapped, then what the profiler saw
+    profiler = Profiler()
+    print("Profiler overhead on headless AI matches")
+    for size in sizes:
+        start = time.perf_counter()
+        for seed in range(games):
+            run_match(board_size=size, max_turns=max_turns, seed=seed)
+        plain_time = time.perf_counter() - start
+
+        profiler.install()
+        start = time.perf_counter()
+        for seed in range(games):
+            run_match(board_size=size, max_turns=max_turns, seed=seed)
+        profiled_time = time.perf_counter() - start
+        profiler.uninstall()
+
+        print(f"  {size}x{size}: off {plain_time * 1000:8.1f} ms   on {profiled_time * 1000:8.1f} ms "
+              f"({(profiled_time / plain_time - 1) * 100:+.0f}%)")
+        for line in profiler.overlay_lines():
+            print("    " + line)
+        profiler.reset()
+
+# Run in a fresh interpreter per sample, so imports and the sprite cache start cold.
+# Prints ms from the first line to the start screen and to the first frame of a match.
+STARTUP_SCRIPT = '''
+import time
+start = time.perf_counter()
+import os, sys
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+import constants
+constants.SPRITE_CACHE_PATH = sys.argv[1]
+from game import Game
+game = Game()
+game.draw()
+start_screen = time.perf_counter() - start
+game.game_mode = constants.MODE_PVE
+game.init_game()
+game.state = constants.STATE_PLAYING
+game.draw()
+print(start_screen * 1000, (time.perf_counter() - start) * 1000)
+game.ai_worker.shutdown()
+game.assets.shutdown()
+'''
+
+# Loads every sprite up front, as the game did before sprites were loaded lazily
+EAGER_SCRIPT = '''
+import time
+start = time.perf_counter()
+import os
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+import pygame
+from constants import ASSET_PATH, TILE_SIZE
+pygame.init()
+pygame.display.set_mode((TILE_SIZE, TILE_SIZE))
+for name in ("coin", "obstacle", "magnet", "ghost", "player1", "player2"):
+    image = pygame.image.load(os.path.join(ASSET_PATH, name + ".png")).convert_alpha()
+    pygame.transform.smoothscale(image, (TILE_SIZE, TILE_SIZE))
+print((time.perf_counter() - start) * 1000)
+'''
+
+def run_script(script, *args):
+    here = os.path.dirname(os.path.abspath(__file__))
+    out = subprocess.run([sys.executable, "-c", script, *args], cwd=here, capture_output=True, text=True, check=True)
+    return [float(value) for value in out.stdout.split()[-2:]] if args else float(out.stdout.split()[-1])
+
+def bench_startup(runs):
+    print(f"Time to first frame, median of {runs} fresh processes")
+    eager = sorted(run_script(EAGER_SCRIPT) for _ in range(runs))[runs // 2]
+    print(f"  pygame init + decoding and scaling every sprite up front: {eager:7.1f} ms")
+    with tempfile.TemporaryDirectory() as cache_path:
+        cold = []
+        warm = []
+        for _ in range(runs):
+            for name in os.listdir(cache_path):
+                os.remove(os.path.join(cache_path, name))
+            cold.append(run_script(STARTUP_SCRIPT, cache_path))
+            warm.append(run_script(STARTUP_SCRIPT, cache_path))
+    for label, samples in (("no sprite cache", cold), ("sprite cache   ", warm)):
+        start_screen = sorted(sample[0] for sample in samples)[runs // 2]
+        match = sorted(sample[1] for sample in samples)[runs // 2]
+        print(f"  {label}: start screen {start_screen:7.1f} ms   first match frame {match:7.1f} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmarks for the game core")
+    subparsers = parser.add_subparsers(dest="bench", required=True)
+
+    magnet = subparsers.add_parser("magnet", help="magnet radius collection")
+    magnet.add_argument("--sizes", type=int, nargs="+", default=[64, 256])
+    magnet.add_argument("--pickups", type=int, default=200)
+    magnet.add_argument("--radius", type=int, default=1)
+
+    bfs = subparsers.add_parser("bfs", help="AI distance-field moves against the old BFS")
+    bfs.add_argument("--sizes", type=int, nargs="+", default=[8, 16, 32])
+    bfs.add_argument("--seeds", type=int, default=20)
+    bfs.add_argument("--starts", type=int, default=10)
+
+    fields = subparsers.add_parser("fields", help="incremental distance fields against full rebuilds")
+    fields.add_argument("--sizes", type=int, nargs="+", default=[8, 16, 32, 64])
+    fields.add_argument("--games", type=int, default=5)
+    fields.add_argument("--max-turns", type=int, default=400)
+
+    ghost = subparsers.add_parser("ghost", help="ghost next-hop table against per-move BFS")
+    ghost.add_argument("--sizes", type=int, nargs="+", default=[8, 16, 24, 32])
+    ghost.add_argument("--queries", type=int, default=2000)
+
+    generate = subparsers.add_parser("generate", help="board generation across sizes")
+    generate.add_argument("--sizes", type=int, nargs="+", default=[8, 32, 64, 128, 256, 512])
+    generate.add_argument("--legacy-max", type=int, default=64, help="largest size to also run the old generator on")
+    generate.add_argument("--repeats", type=int, default=3)
+
+    render = subparsers.add_parser("render", help="dirty-tile renderer against full redraws")
+    render.add_argument("--sizes", type=int, nargs="+", default=[8, 16, 32])
+    render.add_argument("--frames", type=int, default=50)
+
+    search = subparsers.add_parser("search", help="lookahead AI strength and depth reached per budget")
+    search.add_argument("--budgets", type=int, nargs="+", default=[10, 50])
+    search.add_argument("--games", type=int, default=20)
+    search.add_argument("--size", type=int, default=8)
+
+    mcts = subparsers.add_parser("mcts", help="MCTS AI strength and playouts per budget")
+    mcts.add_argument("--budgets", type=int, nargs="+", default=[10, 50])
+    mcts.add_argument("--games", type=int, default=20)
+    mcts.add_argument("--size", type=int, default=8)
+    mcts.add_argument("--workers", type=int, default=1, help="root-parallel processes per move")
+
+    unmake = subparsers.add_parser("unmake", help="make/unmake rollback against deep copies")
+    unmake.add_argument("--sizes", type=int, nargs="+", default=[8, 16, 32])
+    unmake.add_argument("--games", type=int, default=5)
+    unmake.add_argument("--max-turns", type=int, default=200)
+
+    memory = subparsers.add_parser("memory", help="bytes per entity and per match state")
+    memory.add_argument("--sizes", type=int, nargs="+", default=[8, 32, 128])
+    memory.add_argument("--count", type=int, default=100000)
+
+    batch = subparsers.add_parser("batch", help="NumPy lockstep engine against scalar matches (needs numpy)")
+    batch.add_argument("--sizes", type=int, nargs="+", default=[8, 16, 32])
+    batch.add_argument("--games", type=int, default=200)
+    batch.add_argument("--max-turns", type=int, default=1000)
+
+    profile = subparsers.add_parser("profile", help="hot-path profiler overhead and per-call latencies")
+    profile.add_argument("--sizes", type=int, nargs="+", default=[8, 32])
+    profile.add_argument("--games", type=int, default=20)
+    profile.add_argument("--max-turns", type=int, default=400)
+
+    atlas = subparsers.add_parser("atlas", help="board items drawn from the sprite atlas against one blit each")
+    atlas.add_argument("--sizes", type=int, nargs="+", default=[8, 24, 48])
+    atlas.add_argument("--repeats", type=int, default=5)
+
+    viewport = subparsers.add_parser("viewport", help="scrolling, zooming camera view across board sizes")
+    viewport.add_argument("--sizes", type=int, nargs="+", default=[8, 32, 128, 256])
+    viewport.add_argument("--frames", type=int, default=60)
+    viewport.add_argument("--view-tiles", type=int, default=12)
+
+    spatial = subparsers.add_parser("spatial", help="chunked item index against grid scans")
+    spatial.add_argument("--sizes", type=int, nargs="+", default=[16, 64, 128])
+    spatial.add_argument("--queries", type=int, default=200)
+    spatial.add_argument("--view", type=int, default=12, help="tiles per side of the region queries")
+
+    startup = subparsers.add_parser("startup", help="time to first frame, with and without the sprite cache")
+    startup.add_argument("--runs", type=int, default=5)
+
+    args = parser.parse_args()
+    if args.bench == "magnet":
+        bench_magnet(args.sizes, args.pickups, args.radius)
+    elif args.bench == "bfs":
+        bench_bfs(args.sizes, args.seeds, args.starts)
+    elif args.bench == "ghost":
+        bench_ghost(args.sizes, args.queries)
+    elif args.bench == "generate":
+        bench_generate(args.sizes, args.legacy_max, args.repeats)
+    elif args.bench == "render":
+        bench_render(args.sizes, args.frames)
+    elif args.bench == "fields":
+        bench_fields(args.sizes, args.games, args.max_turns)
+    elif args.bench == "search":
+        bench_search(args.budgets, args.games, args.size)
+    elif args.bench == "mcts":
+        bench_mcts(args.budgets, args.games, args.size, args.workers)
+    elif args.bench == "unmake":
+        bench_unmake(args.sizes, args.games, args.max_turns)
+    elif args.bench == "memory":
+        bench_memory(args.sizes, args.count)
+    elif args.bench == "batch":
+        bench_batch(args.sizes, args.games, args.max_turns)
+    elif args.bench == "profile":
+        bench_profile(args.sizes, args.games, args.max_turns)
+    elif args.bench == "atlas":
+        bench_atlas(args.sizes, args.repeats)
+    elif args.bench == "viewport":
+        bench_viewport(args.sizes, args.frames, args.view_tiles)
+    elif args.bench == "spatial":
+        bench_spatial(args.sizes, args.queries, args.view)
+    elif args.bench == "startup":
+        bench_startup(args.runs)
+
+if __name__ == "__main__":
+    main()
@@ -1,108 +1,541 @@
+import argparse
+import copy
 import pygame
 import random
-from constants import BOARD_SIZE, TILE_SIZE, GRAY
+from collections import deque
+from collections.abc import Mapping
+from heapq import heapify, heappop, heappush
+from itertools import compress
+from constants import BOARD_SIZE, GRAY, MIN_BOARD_SIZE, NEXT_HOP_TABLE_MAX_TILES, SPATIAL_INDEX_MIN_SIZE
+from spatial import ChunkIndex
 
 class Coin:
+    __slots__ = ('x', 'y', 'value')
+
     def __init__(self, x, y, value=1):
         self.x = x
         self.y = y
         self.value = value
         
 class Magnet:
+    __slots__ = ('x', 'y', 'radius', 'duration')
+
     def __init__(self, x, y):
         self.x = x
         self.y = y
         self.radius = 1
         self.duration = 3
 
+# Tile codes stored in Board.grid
+EMPTY = 0
+OBSTACLE = 1
+COIN = 2
+MAGNET = 3
+
+# Distance field value for tiles that cannot reach any target
+UNREACHABLE = -1
+
+# Moves stored in the next-hop table: up, down, left, right
+STEPS = [(-1, 0), (1, 0), (0, -1), (0, 1)]
+NO_HOP = 255
+
+# Turns every COIN byte of a grid slice into EMPTY in one call
+_CLEAR_COINS = bytes.maketrans(bytes([COIN]), bytes([EMPTY]))
+# Turns a grid of walls into 1 for every open tile and 0 for every wall
+_OPEN_TILES = bytes.maketrans(bytes([EMPTY, OBSTACLE]), bytes([1, 0]))
+
+class BoardItems(Mapping):
+    # (x, y) -> item view of one tile type in a board's grid. Items are made when asked for,
+    # so generating or loading a board doesn't build an object per coin.
+    __slots__ = ('board', 'code', 'make')
+
+    def __init__(self, board, code, make):
+        self.board = board
+        self.code = code
+        self.make = make
+
+    def __len__(self):
+        if self.code == COIN:
+            return self.board.coins_left()
+        return self.board.grid.count(self.code)
+
+    def __contains__(self, position):
+        return self.board.tile(*position) == self.code
+
+    def __iter__(self):
+        size = self.board.size
+        grid = self.board.grid
+        idx = grid.find(self.code)
+        while idx != -1:
+            yield divmod(idx, size)
+            idx = grid.find(self.code, idx + 1)
+
+    def __getitem__(self, position):
+        if position not in self:
+            raise KeyError(position)
+        return self.make(*position)
+
+def board_size_arg(value):
+    # argparse type for --size options
+    size = int(value)
+    if size < MIN_BOARD_SIZE:
+        raise argparse.ArgumentTypeError(f"board size must be at least {MIN_BOARD_SIZE}, got {size}")
+    return size
+
 class Board:
-    def __init__(self, size=BOARD_SIZE, coin_prob=0.5, magnet_prob=0.1, obstacle_prob=0.85):
+    def __init__(self, size=BOARD_SIZE, coin_prob=0.5, magnet_prob=0.1, obstacle_prob=0.85, rng=None):
         self.size = size
-        self.coins = []
-        self.obstacles = []
-        self.magnets = []
+        self.rng = rng if rng is not None else random.Random()
+        # One byte per tile, indexed by x * size + y
+        self.grid = bytearray(size * size)
+        self._fields = {}  # tile code -> distance field, repaired when that tile type is removed
+        self.cleared_tiles = None  # indices of items picked up or put back, once a renderer tracks them
         self.generate_obstacles(obstacle_prob)
+        # Obstacles never move, so shortest routes only ever need to be found once
+        self.next_hops = self.build_next_hop_table() if size * size <= NEXT_HOP_TABLE_MAX_TILES else None
+        self._coin_count = 0  # coins on the grid, kept by everything that adds or removes one
         self.generate_elements(coin_prob, magnet_prob)
+        self._index = None  # walls, coins and magnets by chunk, built by the first region query
 
     def generate_obstacles(self, obstacle_prob):
-        for i in range(1, (self.size + 1) // 2, 2):
-            for j in range(i, (self.size + 1) // 2):
-                self.obstacles.append((i, j))
-                self.obstacles.append((self.size - i - 1, self.size - j - 1))
-                self.obstacles.append((i, self.size - j - 1))
-                self.obstacles.append((self.size - i - 1, j))
-
-        for i in range(1, (self.size + 1) // 2, 2):
-            for j in range(i, (self.size + 1) // 2):
-                self.obstacles.append((j, i))
-                self.obstacles.append((self.size - j - 1, self.size - i - 1))
-                self.obstacles.append((j, self.size - i - 1))
-                self.obstacles.append((self.size - j - 1, i))
-
-        removed = []
-        middle_tile = (self.size + 1) // 2 if self.size % 2 == 0 else self.size // 2
-        for i in self.obstacles[:]:
-            if i[0] == middle_tile or i[1] == middle_tile:
-                self.obstacles.remove(i)
-                removed.append(i)
-            else:
-                rand_val = random.random()
-                if rand_val < 1 - obstacle_prob:
-                    self.obstacles.remove(i)
+        # Candidate walls form a symmetric pattern of bars: for every other row i, tiles j
+        # along it, each with its three mirror images, then the same bars transposed. The
+        # candidate list is built in that order, rolled for in bulk, and kept ones are marked
+        # straight into the grid, which also takes care of duplicates.
+        size = self.size
+        last = size - 1
+        half = (size + 1) // 2
+        middle_tile = (size + 1) // 2 if size % 2 == 0 else size // 2
+        drop_below = 1 - obstacle_prob
+        random_value = self.rng.random
+        grid = self.grid
+        order = [x * size + y
+                 for i in range(1, half, 2)
+                 for j in range(i, half)
+                 for x, y in ((i, j), (last - i, last - j), (i, last - j), (last - i, j))]
+        order += [x * size + y
+                  for i in range(1, half, 2)
+                  for j in range(i, half)
+                  for x, y in ((j, i), (last - j, last - i), (j, last - i), (last - j, i))]
+
+        # Candidates on the middle lines are never rolled for, and the outmost ring still
+        # uses up its roll but never keeps a wall
+        middle = bytearray(size * size)
+        border = bytearray(size * size)
+        if 0 <= middle_tile < size:
+            middle[middle_tile * size:(middle_tile + 1) * size] = bytes([1]) * size
+            middle[middle_tile::size] = bytes([1]) * size
+        border[:size] = border[-size:] = bytes([1]) * size
+        border[::size] = border[last::size] = bytes([1]) * size
+        removed = [idx for idx in order if middle[idx]]
+        rolled = [idx for idx in order if not middle[idx]]
+        rolls = [random_value() for _ in rolled]
+        for idx, roll in zip(rolled, rolls):
+            if roll >= drop_below and not border[idx]:
+                grid[idx] = OBSTACLE
 
-        for i in range(min(1, len(removed))):
-            selected = random.choice(removed)
-            self.obstacles.append(selected)
-            removed.remove(selected)
+        # Put one wall back on the middle lines
+        if removed:
+            x, y = divmod(self.rng.choice(removed), size)
+            if 0 < x < last and 0 < y < last:
+                grid[x * size + y] = OBSTACLE
 
-        # Remove duplicates & outmost grid
-        self.obstacles = list(set(self.obstacles))
-        self.obstacles = [pos for pos in self.obstacles if pos[0] != 0 and pos[0] != self.size - 1 and pos[1] != 0 and pos[1] != self.size - 1]
 
     def generate_elements(self, coin_prob, magnet_prob):
-        for i in range(self.size):
-            for j in range(self.size):
-                if (i, j) in self.obstacles or (i, j) in [(0, 0), (self.size - 1, self.size - 1)]:
-                    continue
-                rand_val = random.random()
-                if rand_val < magnet_prob:
-                    self.magnets.append(Magnet(i, j))
-                elif rand_val < coin_prob + magnet_prob:
-                    self.coins.append(Coin(i, j))
+        # Every open tile but the corners the players start on gets one roll, in grid order
+        size = self.size
+        grid = self.grid
+        random_value = self.rng.random
+        coin_limit = coin_prob + magnet_prob
+        open_tiles = grid.translate(_OPEN_TILES)
+        open_tiles[0] = open_tiles[-1] = 0
+        candidates = list(compress(range(size * size), open_tiles))
+        rolls = [random_value() for _ in candidates]
+        magnets = [idx for idx, roll in zip(candidates, rolls) if roll < magnet_prob]
+        coins = [idx for idx, roll in zip(candidates, rolls) if magnet_prob <= roll < coin_limit]
+        for idx in magnets:
+            grid[idx] = MAGNET
+        for idx in coins:
+            grid[idx] = COIN
+        self._coin_count = len(coins)
+
+    @property
+    def coins(self):
+        return BoardItems(self, COIN, Coin)
+
+    @property
+    def magnets(self):
+        return BoardItems(self, MAGNET, Magnet)
+
+    @property
+    def obstacles(self):
+        return list(BoardItems(self, OBSTACLE, None))
+
+    def snapshot(self):
+        # Private copy for another thread. Obstacles never change and are shared, and so is the
+        # next-hop table, which both threads fill lazily (see build_next_hop_table).
+        board = copy.copy(self)
+        board.grid = bytearray(self.grid)
+        board._fields = {target: list(field) for target, field in self._fields.items()}
+        board._index = None
+        board.cleared_tiles = None
+        return board
+
+    def load_grid(self, grid):
+        # Replaces coins and magnets with those in grid, a copy of another grid with the same walls
+        size = self.size
+        changed = [i for i, (old, new) in enumerate(zip(self.grid, grid)) if old != new]
+        if not changed:
+            return
+        self._coin_count += sum((grid[idx] == COIN) - (self.grid[idx] == COIN) for idx in changed)
+        index = self._index
+        if index is not None:
+            for idx in changed:
+                x, y = divmod(idx, size)
+                if self.grid[idx] != EMPTY:
+                    index.remove(self.grid[idx], x, y)
+                if grid[idx] != EMPTY:
+                    index.add(grid[idx], x, y)
+        self.grid[:] = grid
+        self._fields = {}
+        if self.cleared_tiles is not None:
+            self.cleared_tiles.extend(changed)
+
+    def track_cleared(self):
+        # Starts recording cleared_tiles. Only a renderer drains the list, so boards that are
+        # never drawn, like the ones searches make and unmake moves on, don't keep it.
+        self.cleared_tiles = []
+
+    def tile(self, x, y):
+        if 0 <= x < self.size and 0 <= y < self.size:
+            return self.grid[x * self.size + y]
+        return EMPTY
 
     def is_obstacle(self, x, y):
-        return (x, y) in self.obstacles
+        return self.tile(x, y) == OBSTACLE
 
     def is_coin(self, x, y):
-        return any(c.x == x and c.y == y for c in self.coins)
+        return self.tile(x, y) == COIN
 
     def is_magnet(self, x, y):
-        return any(m.x == x and m.y == y for m in self.magnets)
+        return self.tile(x, y) == MAGNET
 
     def remove_coin(self, x, y):
-        self.coins = [c for c in self.coins if not (c.x == x and c.y == y)]
+        if not self.is_coin(x, y):
+            return None
+        self.grid[x * self.size + y] = EMPTY
+        self._coin_count -= 1
+        if self._index is not None:
+            self._index.remove(COIN, x, y)
+        self._targets_removed(COIN, [x * self.size + y])
+        return Coin(x, y)
 
     def remove_magnet(self, x, y):
-        self.magnets = [m for m in self.magnets if not (m.x == x and m.y == y)]
+        if not self.is_magnet(x, y):
+            return None
+        self.grid[x * self.size + y] = EMPTY
+        if self._index is not None:
+            self._index.remove(MAGNET, x, y)
+        self._targets_removed(MAGNET, [x * self.size + y])
+        return Magnet(x, y)
+
+    def restore_items(self, items):
+        # Puts back coins and magnets returned by the remove and collect methods
+        size = self.size
+        added = {COIN: [], MAGNET: []}
+        for item in items:
+            idx = item.x * size + item.y
+            if isinstance(item, Magnet):
+                self.grid[idx] = MAGNET
+                added[MAGNET].append(idx)
+            else:
+                self.grid[idx] = COIN
+                added[COIN].append(idx)
+        self._coin_count += len(added[COIN])
+        for target, tiles in added.items():
+            if tiles:
+                if self._index is not None:
+                    for idx in tiles:
+                        self._index.add(target, *divmod(idx, size))
+                self._targets_added(target, tiles)
 
     def collect_coins_in_radius(self, center_x, center_y, radius):
         collected = []
-        for coin in list(self.coins):
-            dx = abs(coin.x - center_x)
-            dy = abs(coin.y - center_y)
-            if dx <= radius and dy <= radius:
-                collected.append(coin)
-                self.coins.remove(coin)
+        size = self.size
+        y0 = max(0, center_y - radius)
+        y1 = min(size, center_y + radius + 1)
+        for x in range(max(0, center_x - radius), min(size, center_x + radius + 1)):
+            start = x * size
+            row = self.grid[start + y0:start + y1]
+            y = row.find(COIN)
+            if y == -1:
+                continue
+            while y != -1:
+                collected.append(Coin(x, y0 + y))
+                y = row.find(COIN, y + 1)
+            self.grid[start + y0:start + y1] = row.translate(_CLEAR_COINS)
+        if collected:
+            self._coin_count -= len(collected)
+            if self._index is not None:
+                self._index.remove_all(COIN, [(coin.x, coin.y) for coin in collected])
+            self._targets_removed(COIN, [coin.x * size + coin.y for coin in collected])
         return collected
 
-    def draw(self, screen, coin_img, obstacle_img, magnet_img):
-        for x in range(self.size):
-            for y in range(self.size):
-                rect = pygame.Rect(y * TILE_SIZE, x * TILE_SIZE, TILE_SIZE, TILE_SIZE)
-                pygame.draw.rect(screen, GRAY, rect, 1)
-        for (x, y) in self.obstacles:
-            screen.blit(obstacle_img, (y * TILE_SIZE, x * TILE_SIZE))
-        for coin in self.coins:
-            screen.blit(coin_img, (coin.y * TILE_SIZE, coin.x * TILE_SIZE))
-        for magnet in self.magnets:
-            screen.blit(magnet_img, (magnet.y * TILE_SIZE, magnet.x * TILE_SIZE))
\ No newline at end of file
+    def coins_left(self):
+        return self._coin_count
+
+    def spatial_index(self):
+        # The chunk index, built on first use and kept up to date from then on. Boards below
+        # SPATIAL_INDEX_MIN_SIZE are scanned faster than the index is kept, so they go without.
+        if self._index is None and self.size >= SPATIAL_INDEX_MIN_SIZE:
+            self._index = ChunkIndex(self.size, (OBSTACLE, COIN, MAGNET))
+            self._index.build(self.grid)
+        return self._index
+
+    def _region_rows(self, target, top, bottom, left, right):
+        # Rows of the region that can hold a tile of type target
+        index = self.spatial_index()
+        if index is None:
+            return range(top, bottom)
+        chunk = index.chunk
+        return [x for band in index.bands_in(target, top, bottom, left, right)
+                for x in range(max(top, band * chunk), min(bottom, band * chunk + chunk))]
+
+    def items_in(self, target, top, bottom, left, right):
+        # (x, y) of the tiles of type target in rows [top, bottom) and columns [left, right),
+        # scanned a row at a time with find
+        size = self.size
+        grid = self.grid
+        found = []
+        for x in self._region_rows(target, top, bottom, left, right):
+            row = x * size
+            idx = grid.find(target, row + left, row + right)
+            while idx != -1:
+                found.append((x, idx - row))
+                idx = grid.find(target, idx + 1, row + right)
+        return found
+
+    def distance_field(self, target):
+        # Steps from every tile (indexed x * size + y) to the nearest tile of type target
+        field = self._fields.get(target)
+        if field is None:
+            field = self._fields[target] = self.compute_distance_field(target)
+        return field
+
+    def compute_distance_field(self, target):
+        # Multi-source BFS seeded from every target tile at once
+        size = self.size
+        total = size * size
+        last_col = size - 1
+        grid = self.grid
+        field = [UNREACHABLE] * total
+        queue = deque()
+
+        idx = grid.find(target)
+        while idx != -1:
+            field[idx] = 0
+            queue.append(idx)
+            idx = grid.find(target, idx + 1)
+
+        while queue:
+            idx = queue.popleft()
+            dist = field[idx] + 1
+            col = idx % size
+            for nxt in (idx - size, idx + size,
+                        idx - 1 if col else -1,
+                        idx + 1 if col != last_col else -1):
+                if 0 <= nxt < total and field[nxt] == UNREACHABLE and grid[nxt] != OBSTACLE:
+                    field[nxt] = dist
+                    queue.append(nxt)
+        return field
+
+    def build_next_hop_table(self):
+        # next_hops[dst * tiles + src] is the STEPS index of the first move from src towards dst.
+        # Rows are filled by one BFS the first time a destination is asked for. A row depends only
+        # on the walls, so boards sharing the table from snapshot() on other threads may fill the
+        # same row at once: they write identical bytes, and a row is only marked done once whole.
+        tiles = self.size * self.size
+        self._next_hop_rows = bytearray(tiles)
+        return bytearray([NO_HOP]) * (tiles * tiles)
+
+    def _search_next_hops(self, hops, offset, dst, src=None, limit=None):
+        # BFS outwards from dst, recording for each tile the step back towards where it was reached from.
+        # Stops at src, or once limit tiles are reached. Returns the number of tiles reached, for the profiler.
+        size = self.size
+        tiles = size * size
+        last_col = size - 1
+        grid = self.grid
+        hops[offset + dst] = NO_HOP
+        seen = bytearray(tiles)
+        seen[dst] = 1
+        reached = 1
+        queue = deque([dst])
+        while queue:
+            idx = queue.popleft()
+            col = idx % size
+            # (tile, step from that tile back to idx)
+            for nxt, step in ((idx - size, 1), (idx + size, 0),
+                              (idx - 1 if col else -1, 3),
+                              (idx + 1 if col != last_col else -1, 2)):
+                if nxt < 0 or nxt >= tiles or seen[nxt] or grid[nxt] == OBSTACLE:
+                    continue
+                seen[nxt] = 1
+                reached += 1
+                hops[offset + nxt] = step
+                if nxt == src:
+                    return reached
+                queue.append(nxt)
+            if limit is not None and reached >= limit:
+                break
+        return reached
+
+    def next_hop(self, x, y, target_x, target_y, limit=None):
+        # (dx, dy) of the first step on a shortest path, or None if there is none
+        size = self.size
+        step = self.next_hop_step(x * size + y, target_x * size + target_y, limit)
+        return None if step == NO_HOP else STEPS[step]
+
+    def next_hop_step(self, src, dst, limit=None):
+        # STEPS index of the first move from tile index src towards dst, NO_HOP without one.
+        # Without a table, limit caps the tiles searched and gives NO_HOP for routes farther than that.
+        if src == dst:
+            return NO_HOP
+        if self.next_hops is not None:
+            offset = dst * self.size * self.size
+            if not self._next_hop_rows[dst]:
+                self._search_next_hops(self.next_hops, offset, dst)
+                self._next_hop_rows[dst] = 1
+            return self.next_hops[offset + src]
+        # Board too large to tabulate, search just this pair
+        hops = {}
+        self._search_next_hops(hops, 0, dst, src, limit)
+        return hops.get(src, NO_HOP)
+
+    def _neighbours(self, idx):
+        size = self.size
+        col = idx % size
+        grid = self.grid
+        if idx >= size and grid[idx - size] != OBSTACLE:
+            yield idx - size
+        if idx < len(grid) - size and grid[idx + size] != OBSTACLE:
+            yield idx + size
+        if col and grid[idx - 1] != OBSTACLE:
+            yield idx - 1
+        if col != size - 1 and grid[idx + 1] != OBSTACLE:
+            yield idx + 1
+
+    def _targets_removed(self, target, removed):
+        if self.cleared_tiles is not None:
+            self.cleared_tiles.extend(removed)
+        field = self._fields.get(target)
+        if field is not None:
+            self._repair_distance_field(field, removed)
+
+    def _targets_added(self, target, added):
+        if self.cleared_tiles is not None:
+            self.cleared_tiles.extend(added)
+        field = self._fields.get(target)
+        if field is not None:
+            self._extend_distance_field(field, added)
+
+    def _extend_distance_field(self, field, added):
+        # New targets can only shorten routes, so BFS out from them while they do
+        queue = deque(added)
+        for idx in added:
+            field[idx] = 0
+        while queue:
+            idx = queue.popleft()
+            dist = field[idx] + 1
+            for nxt in self._neighbours(idx):
+                if field[nxt] == UNREACHABLE or field[nxt] > dist:
+                    field[nxt] = dist
+                    queue.append(nxt)
+
+    def _repair_distance_field(self, field, removed):
+        # Decremental BFS: only tiles whose every shortest route led to a removed
+        # target change. Find them level by level outwards from the removed tiles,
+        # then re-relax just that region from its unaffected border. Returns the
+        # number of tiles that had to be re-relaxed, for the profiler.
+        affected = set(removed)
+        queue = deque(removed)
+        while queue:
+            idx = queue.popleft()
+            dist = field[idx] + 1
+            for nxt in self._neighbours(idx):
+                if field[nxt] != dist or nxt in affected:
+                    continue
+                supported = False
+                for prev in self._neighbours(nxt):
+                    if field[prev] == dist - 1 and prev not in affected:
+                        supported = True
+                        break
+                if not supported:
+                    affected.add(nxt)
+                    queue.append(nxt)
+
+        for idx in affected:
+            field[idx] = UNREACHABLE
+
+        frontier = []
+        for idx in affected:
+            best = UNREACHABLE
+            for nxt in self._neighbours(idx):
+                dist = field[nxt]
+                if dist != UNREACHABLE and (best == UNREACHABLE or dist + 1 < best):
+                    best = dist + 1
+            if best != UNREACHABLE:
+                frontier.append((best, idx))
+        heapify(frontier)
+
+        while frontier:
+            dist, idx = heappop(frontier)
+            if field[idx] != UNREACHABLE:
+                continue
+            field[idx] = dist
+            for nxt in self._neighbours(idx):
+                if field[nxt] == UNREACHABLE and nxt in affected:
+                    heappush(frontier, (dist + 1, nxt))
+        return len(affected)
+
+    def draw_static(self, screen, atlas, camera):
+        # Grid lines and obstacles of the tiles in view. Every tile has a 1px outline,
+        # drawn as two lines along each tile boundary.
+        top, bottom, left, right = camera.span()
+        tile = camera.tile
+        width = (right - left) * tile - 1
+        height = (bottom - top) * tile - 1
+        for i in range(right - left):
+            for edge in (i * tile, i * tile + tile - 1):
+                pygame.draw.line(screen, GRAY, (edge, 0), (edge, height))
+        for i in range(bottom - top):
+            for edge in (i * tile, i * tile + tile - 1):
+                pygame.draw.line(screen, GRAY, (0, edge), (width, edge))
+        screen.blits(self._tile_blits(atlas, camera, {OBSTACLE: atlas.areas['obstacle']},
+                                      [(top, bottom, left, right)]), False)
+
+    def draw(self, screen, atlas, camera, rects=None):
+        # Draws the coins and magnets in view in one Surface.blits call, only on the tiles covered by rects when given
+        areas = {COIN: atlas.areas['coin'], MAGNET: atlas.areas['magnet']}
+        if rects is None:
+            spans = [camera.span()]
+        else:
+            spans = [camera.span(rect) for rect in rects]
+        screen.blits(self._tile_blits(atlas, camera, areas, spans), False)
+
+    def _tile_blits(self, atlas, camera, areas, spans):
+        # Surface.blits entries for the tiles of the types in areas inside the spans, looked up
+        # with items_in, so the cost follows the tiles in view and not the board size
+        image = atlas.surface
+        tile = camera.tile
+        top_edge = camera.top
+        left_edge = camera.left
+        drawn = set()
+        blits = []
+        for top, bottom, left, right in spans:
+            for target, area in areas.items():
+                for x, y in self.items_in(target, top, bottom, left, right):
+                    # Dirty rects overlap; a sprite blended twice would come out darker
+                    if (x, y) not in drawn:
+                        drawn.add((x, y))
+                        blits.append((image, ((y - left_edge) * tile, (x - top_edge) * tile), area))
+        return blits
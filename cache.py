@@ -0,0 +1,112 @@
+import pygame
+from collections import OrderedDict
+from constants import TILE_SIZE, TEXT_CACHE_SIZE
+
+# Everything the playing screen draws from the atlas, players in both facings
+ATLAS_SPRITES = ['coin', 'obstacle', 'magnet', 'ghost'] + [
+    ('player', symbol, facing) for symbol in 'AB' for facing in ('left', 'right')]
+
+class SpriteAtlas:
+    # Sprites side by side on one surface, so a whole layer of tiles is one Surface.blits
+    # call of (atlas.surface, position, atlas.areas[name]) entries
+    def __init__(self, sprites, tile=TILE_SIZE):
+        sprites = [(key, surface if surface.get_size() == (tile, tile)
+                    else pygame.transform.smoothscale(surface, (tile, tile))) for key, surface in sprites]
+        width = sum(surface.get_width() for key, surface in sprites)
+        height = max(surface.get_height() for key, surface in sprites)
+        self.surface = pygame.Surface((width, height), pygame.SRCALPHA)
+        self.areas = {}
+        x = 0
+        for key, surface in sprites:
+            # MAX onto the transparent atlas copies the pixels as they are, alpha included
+            self.surface.blit(surface, (x, 0), special_flags=pygame.BLEND_RGBA_MAX)
+            self.areas[key] = pygame.Rect(x, 0, surface.get_width(), surface.get_height())
+            x += surface.get_width()
+        if pygame.display.get_surface() is not None:
+            self.surface = self.surface.convert_alpha()
+
+class SpriteTable(dict):
+    # Sprites by name, fetched through `load` the first time one is looked up
+    def __init__(self, load=None):
+        super().__init__()
+        self.load = load
+
+    def __missing__(self, key):
+        if self.load is not None:
+            self.load(key)
+        if not dict.__contains__(self, key):
+            raise KeyError(key)
+        return dict.get(self, key)
+
+class SurfaceCache:
+    # Surfaces that would otherwise be rebuilt every frame: sprites and their
+    # flipped variants, magnet auras, fonts and rendered text.
+    # load_scaled(key, tile) returns a sprite scaled from its source image, for zooms above TILE_SIZE.
+    def __init__(self, text_capacity=TEXT_CACHE_SIZE, load_sprite=None, load_scaled=None):
+        self.sprites = SpriteTable(load_sprite)
+        self.load_scaled = load_scaled
+        self._atlases = {}
+        self.fonts = {}
+        self.auras = {}
+        self.text_capacity = text_capacity
+        self._texts = OrderedDict()
+
+    def add_sprite(self, name, surface):
+        self.sprites[name] = surface
+
+    def add_player(self, symbol, surface, facing):
+        # Keeps the sprite as drawn for `facing` and a mirrored copy for the other side
+        other = 'left' if facing == 'right' else 'right'
+        self.sprites['player', symbol, facing] = surface
+        self.sprites['player', symbol, other] = pygame.transform.flip(surface, True, False)
+
+    def player(self, symbol, facing):
+        return self.sprites['player', symbol, facing]
+
+    def atlas(self, tile=TILE_SIZE):
+        # Packed on first use at each zoom level, once every sprite it holds has been loaded
+        atlas = self._atlases.get(tile)
+        if atlas is None:
+            if tile > TILE_SIZE and self.load_scaled is not None:
+                # Enlarging the tile-sized sprites would blur them
+                sprites = [(key, self.load_scaled(key, tile)) for key in ATLAS_SPRITES]
+            else:
+                sprites = [(key, self.sprites[key]) for key in ATLAS_SPRITES]
+            atlas = self._atlases[tile] = SpriteAtlas(sprites, tile)
+        return atlas
+
+    def font(self, name, size, bold=False):
+        # name None is pygame's default font, built without scanning the system fonts
+        key = (name, size, bold)
+        font = self.fonts.get(key)
+        if font is None:
+            if name is None:
+                font = pygame.font.Font(None, size)
+                font.set_bold(bold)
+            else:
+                font = pygame.font.SysFont(name, size, bold=bold)
+            self.fonts[key] = font
+        return font
+
+    def aura(self, radius, color, tile=TILE_SIZE):
+        # Translucent circle covering `radius` tiles around a player
+        key = (radius, color, tile)
+        surface = self.auras.get(key)
+        if surface is None:
+            size = radius * tile
+            surface = pygame.Surface((size * 2, size * 2), pygame.SRCALPHA)
+            pygame.draw.circle(surface, color, (size, size), size)
+            self.auras[key] = surface
+        return surface
+
+    def text(self, font, text, color):
+        # Least recently used entries are dropped once the cache is full
+        key = (font, text, color)
+        surface = self._texts.get(key)
+        if surface is None:
+            surface = self._texts[key] = font.render(text, True, color)
+            if len(self._texts) > self.text_capacity:
+                self._texts.popitem(last=False)
+        else:
+            self._texts.move_to_end(key)
+        return surface
@@ -0,0 +1,70 @@
+import pygame
+from constants import CAMERA_MARGIN, TILE_SIZE
+
+class Camera:
+    # The part of the board that is on screen. Board tile (x, y) is row x, column y and is
+    # drawn at ((y - left) * tile, (x - top) * tile) inside a view of width x height pixels.
+    def __init__(self, width, height, board_size, tile=TILE_SIZE):
+        self.width = width
+        self.height = height
+        self.board_size = board_size
+        self.top = 0
+        self.left = 0
+        self.tile = tile
+        self.fit()
+
+    def fit(self):
+        # Tiles drawn in full, plus a partial one at the far edges when the view doesn't divide evenly
+        tile = self.tile
+        self.full_rows = max(1, self.height // tile)
+        self.full_cols = max(1, self.width // tile)
+        self.rows = min(self.board_size, -(-self.height // tile))
+        self.cols = min(self.board_size, -(-self.width // tile))
+        self.clamp()
+
+    def zoom(self, tile):
+        # Switches to tiles of `tile` pixels, keeping the tile in the middle of the view there
+        middle_x = self.top + self.height / self.tile / 2
+        middle_y = self.left + self.width / self.tile / 2
+        self.tile = tile
+        self.fit()
+        self.top = int(middle_x - self.full_rows / 2)
+        self.left = int(middle_y - self.full_cols / 2)
+        self.clamp()
+
+    def clamp(self):
+        self.top = max(0, min(self.top, self.board_size - self.full_rows))
+        self.left = max(0, min(self.left, self.board_size - self.full_cols))
+
+    def follow(self, x, y):
+        # Scrolls once (x, y) comes within CAMERA_MARGIN tiles of an edge, True if the view moved
+        top, left = self.top, self.left
+        margin_rows = min(CAMERA_MARGIN, (self.full_rows - 1) // 2)
+        margin_cols = min(CAMERA_MARGIN, (self.full_cols - 1) // 2)
+        if x < self.top + margin_rows:
+            self.top = x - margin_rows
+        elif x > self.top + self.full_rows - 1 - margin_rows:
+            self.top = x - self.full_rows + 1 + margin_rows
+        if y < self.left + margin_cols:
+            self.left = y - margin_cols
+        elif y > self.left + self.full_cols - 1 - margin_cols:
+            self.left = y - self.full_cols + 1 + margin_cols
+        self.clamp()
+        return (self.top, self.left) != (top, left)
+
+    def position(self, x, y):
+        return ((y - self.left) * self.tile, (x - self.top) * self.tile)
+
+    def tile_rect(self, x, y):
+        return pygame.Rect((y - self.left) * self.tile, (x - self.top) * self.tile, self.tile, self.tile)
+
+    def span(self, rect=None):
+        # (first row, end row, first column, end column) of the board tiles under a screen rect,
+        # or under the whole view, limited to tiles that are on the board and in view
+        top = self.top
+        left = self.left
+        if rect is None:
+            return top, min(self.board_size, top + self.rows), left, min(self.board_size, left + self.cols)
+        tile = self.tile
+        return (max(top, top + rect.top // tile), min(self.board_size, top + self.rows, top - (-rect.bottom // tile)),
+                max(left, left + rect.left // tile), min(self.board_size, left + self.cols, left - (-rect.right // tile)))
@@ -1,9 +1,14 @@
-import pygame
-
 # Game dimensions
 BOARD_SIZE = 8
+MIN_BOARD_SIZE = 5  # smallest board with inner tiles for the ghost to spawn on
 TILE_SIZE = 80
-SCREEN_SIZE = BOARD_SIZE * TILE_SIZE
+HUD_HEIGHT = 30
+TEXT_CACHE_SIZE = 256  # rendered strings kept by SurfaceCache
+VIEW_TILES = 12  # larger boards scroll inside a window this many tiles wide
+ZOOM_TILE_SIZES = (20, 40, 60, 80, 120)  # tile sizes in pixels the view zooms between
+CAMERA_MARGIN = 2  # tiles kept between the followed player and the edge of the view
+CHUNK_SIZE = 8  # tiles per side of the chunks the spatial index groups items into
+SPATIAL_INDEX_MIN_SIZE = 64  # smaller boards answer region queries by scanning the grid
 
 # Colors
 WHITE = (255, 255, 255)
@@ -15,6 +20,18 @@ YELLOW = (255, 215, 0)
 PURPLE = (128, 0, 128)
 RED = (255, 0, 0)
 
+# Loop timing
+FPS = 60  # frames drawn per second
+SIM_STEP = 100  # ms per simulation step, input is read once per step
+MAX_SIM_STEPS_PER_FRAME = 5  # catch-up limit after a stall
+AI_THINK_TIME = 300  # ms an AI waits before moving, so humans can follow
+AI_MOVE_BUDGET = 1000  # ms an AI may search before its best move so far is played
+SEARCH_BUDGET = 200  # ms SearchPlayer spends per move, None to search to full depth
+SEARCH_MAX_DEPTH = 12  # plies SearchPlayer looks ahead at most
+MCTS_BUDGET = 600  # ms MCTSPlayer spends per move, 1,500 to 2,500 playouts on an 8x8 board
+MCTS_WORKERS = 1  # processes MCTSPlayer searches with, each grows its own tree
+PROFILE_REFRESH = 500  # ms between updates of the profiler overlay
+
 # Game State
 STATE_START = 0
 STATE_PLAYING = 1
@@ -25,4 +42,14 @@ MODE_PVP = 0  # vs Player
 MODE_PVE = 1  # vs AI
 
 # Asset paths
-ASSET_PATH = "./asset/"
\ No newline at end of file
+ASSET_PATH = "./asset/"
+SPRITE_CACHE_PATH = "./.sprite_cache/"  # sprites already scaled to TILE_SIZE
+
+# Simulation
+INVULNERABLE_TIME = 3000  # ms of invulnerability after being caught
+HEADLESS_TURN_TIME = 100  # simulated ms per turn in headless matches
+MAX_TURNS = 10000
+REPLAY_KEYFRAME_INTERVAL = 100  # turns between the snapshots a replay seeks from
+REPLAY_SPEED = 1  # recorded turns played per simulation step when watching a replay
+REPLAY_SEEK = 50  # turns skipped by the arrow keys when watching a replay
+NEXT_HOP_TABLE_MAX_TILES = 24 * 24  # 330 KB table; larger boards fall back to per-move BFS for the ghost
@@ -1,9 +1,16 @@
 import pygame
 import random
-from collections import deque
-from constants import BOARD_SIZE, TILE_SIZE, PURPLE
+import time
+from board import COIN, MAGNET, UNREACHABLE
+from constants import PURPLE, SEARCH_BUDGET, SEARCH_MAX_DEPTH, MCTS_BUDGET, MCTS_WORKERS
+from search import ExpectimaxSearch, MonteCarloSearch, SearchState, root_parallel_visits
+
+DIRECTIONS = [('up', -1, 0), ('down', 1, 0), ('left', 0, -1), ('right', 0, 1)]
 
 class Player:
+    __slots__ = ('symbol', '_position', '_score', '_facing', '_magnet_active',
+                 '_magnet_moves_left', '_magnet_radius', '__lives')
+
     def __init__(self, symbol, x, y):
         self.symbol = symbol
         self._position = (x, y)  # Protected attribute
@@ -68,6 +75,10 @@ class Player:
         if moves <= 0:
             self._magnet_active = False
     
+    @property
+    def magnet_radius(self):
+        return self._magnet_radius
+    
     @property
     def lives(self):
         return self.__lives
@@ -82,8 +93,17 @@ class Player:
         self.__lives += amount
         return self.__lives
 
+    def close(self):
+        # Releases anything the player keeps beyond a match, for the ones that search in processes
+        pass
+
     def move(self, direction, board):
+        return self.make_move(direction, board) is not None
+
+    def make_move(self, direction, board):
+        # Moves like move() but returns an undo record for unmake_move, None if the move is invalid
         x, y = self._position
+        facing = self._facing
         dx, dy = 0, 0
         if direction == 'up': 
             dx = -1
@@ -99,30 +119,43 @@ class Player:
         
         if 0 <= new_x < board.size and 0 <= new_y < board.size:
             if board.is_obstacle(new_x, new_y):
-                return False
+                return None
+            removed = []
+            undo = (self._position, facing, self._score, self._magnet_active, self._magnet_moves_left, removed)
             self._position = (new_x, new_y)
             
             # Pick up magnet
             if board.is_magnet(new_x, new_y):
                 self._magnet_active = True
                 self._magnet_moves_left = 3
-                board.remove_magnet(new_x, new_y)
+                removed.append(board.remove_magnet(new_x, new_y))
             
             # Move onto a coin
             if board.is_coin(new_x, new_y):
                 self._score += 1
-                board.remove_coin(new_x, new_y)
+                removed.append(board.remove_coin(new_x, new_y))
             
             if self._magnet_active:
                 collected_coins = board.collect_coins_in_radius(new_x, new_y, self._magnet_radius)
                 self._score += len(collected_coins)
+                removed.extend(collected_coins)
                 
                 self._magnet_moves_left -= 1
                 if self._magnet_moves_left <= 0:
                     self._magnet_active = False
             
-            return True
-        return False
+            return undo
+        return None
+
+    def unmake_move(self, undo, board):
+        # Takes back a move made by make_move, putting picked up items back on the board
+        position, facing, score, magnet_active, magnet_moves_left, removed = undo
+        board.restore_items(removed)
+        self._position = position
+        self._facing = facing
+        self._score = score
+        self._magnet_active = magnet_active
+        self._magnet_moves_left = magnet_moves_left
 
     def available_moves(self, board):
         moves = []
@@ -139,34 +172,27 @@ class Player:
                     moves.append(direction)
         return moves
 
-    def draw(self, screen, player_img):
+    def draw(self, screen, cache, camera):
         x, y = self._position
-        img = player_img
-
-        if self.symbol == 'A':
-            if self._facing == 'left':
-                img = pygame.transform.flip(player_img, True, False)
-        elif self.symbol == 'B':
-            if self._facing == 'right':
-                img = pygame.transform.flip(player_img, True, False)
-
-        screen.blit(img, (y * TILE_SIZE, x * TILE_SIZE))
+        tile = camera.tile
+        left, top = camera.position(x, y)
+        atlas = cache.atlas(tile)
+        screen.blit(atlas.surface, (left, top), atlas.areas['player', self.symbol, self._facing])
         
         # Draw magnet effect radius when active
         if self._magnet_active:
-            radius = self._magnet_radius * TILE_SIZE
-            center = ((y + 0.5) * TILE_SIZE, (x + 0.5) * TILE_SIZE)
+            center = (left + tile / 2, top + tile / 2)
 
-            s = pygame.Surface((radius*2, radius*2), pygame.SRCALPHA)
-            pygame.draw.circle(s, (128, 0, 128, 75), (radius, radius), radius)
-            screen.blit(s, (center[0]-radius, center[1]-radius))
+            aura = cache.aura(self._magnet_radius, (128, 0, 128, 75), tile)
+            screen.blit(aura, aura.get_rect(center=center))
             
-            font = pygame.font.SysFont("arial", 20)
-            text = font.render(str(self._magnet_moves_left), True, PURPLE)
+            text = cache.text(cache.font("arial", 20), str(self._magnet_moves_left), PURPLE)
             text_rect = text.get_rect(center=center)
             screen.blit(text, text_rect)
 
 class HumanPlayer(Player):
+    __slots__ = ('control_keys',)
+
     def __init__(self, symbol, x, y, control_keys=None):
         super().__init__(symbol, x, y)
         if control_keys is None and symbol == 'A':
@@ -193,50 +219,45 @@ class HumanPlayer(Player):
         return None
 
 class AIPlayer(Player):
-    def __init__(self, symbol, x, y):
+    __slots__ = ('rng',)
+
+    def __init__(self, symbol, x, y, rng=None):
         super().__init__(symbol, x, y)
+        self.rng = rng if rng is not None else random.Random()
         
-    def get_move(self, board):
-        def bfs(start, board, target_types):
-            visited = set()
-            queue = deque([(start, [])])
-            while queue:
-                (x, y), path = queue.popleft()
-                if (x, y) in visited:
-                    continue
-                visited.add((x, y))
-                
-                found = False
-                if 'coin' in target_types and board.is_coin(x, y) and (x, y) != self.position:
-                    found = True
-                if 'magnet' in target_types and board.is_magnet(x, y) and (x, y) != self.position:
-                    found = True
-                
-                if found:
-                    return path
-                
-                for direction, (dx, dy) in {
-                    'up': (-1, 0), 'down': (1, 0),
-                    'left': (0, -1), 'right': (0, 1)
-                }.items():
-                    nx, ny = x + dx, y + dy
-                    if 0 <= nx < board.size and 0 <= ny < board.size and not board.is_obstacle(nx, ny):
-                        queue.append(((nx, ny), path + [direction]))
-            return []
+    def step_towards(self, board, target):
+        # Follow the board's distance field downhill, first direction wins ties
+        field = board.distance_field(target)
+        size = board.size
+        x, y = self.position
+        best_move = None
+        best_dist = UNREACHABLE
+        for direction, dx, dy in DIRECTIONS:
+            nx, ny = x + dx, y + dy
+            if 0 <= nx < size and 0 <= ny < size:
+                dist = field[nx * size + ny]
+                if dist != UNREACHABLE and (best_move is None or dist < best_dist):
+                    best_move = direction
+                    best_dist = dist
+        return best_move
 
+    def search_move(self, sim, request):
+        # Called on a MoveWorker thread: keep request.best_move current and stop once request.expired()
+        request.best_move = self.get_move(sim.board)
+
+    def get_move(self, board, rng=None):
+        # rng draws the random fallback in place of self.rng
         # Find Magnet
         if not self.magnet_active:
-            path_to_magnet = bfs(self.position, board, ['magnet'])
-            if path_to_magnet:
-                next_move = path_to_magnet[0]
+            next_move = self.step_towards(board, MAGNET)
+            if next_move:
                 if next_move in ['left', 'right']:
                     self.facing = next_move
                 return next_move
         
         # Find coins
-        path_to_coin = bfs(self.position, board, ['coin'])
-        if path_to_coin:
-            next_move = path_to_coin[0]
+        next_move = self.step_towards(board, COIN)
+        if next_move:
             if next_move in ['left', 'right']:
                 self.facing = next_move
             return next_move
@@ -245,15 +266,125 @@ class AIPlayer(Player):
         moves = self.available_moves(board)
         if not moves:
             return None
-        fallback = random.choice(moves)
+        fallback = (rng or self.rng).choice(moves)
         if fallback in ['left', 'right']:
             self.facing = fallback
         return fallback
 
+class RandomPlayer(AIPlayer):
+    __slots__ = ()
+
+    def get_move(self, board):
+        moves = self.available_moves(board)
+        if not moves:
+            return None
+        move = self.rng.choice(moves)
+        if move in ['left', 'right']:
+            self.facing = move
+        return move
+
+class SearchPlayer(AIPlayer):
+    # Looks ahead with ExpectimaxSearch, deepening until its budget runs out
+    __slots__ = ('budget_ms', 'max_depth', 'last_search')
+
+    def __init__(self, symbol, x, y, rng=None, budget_ms=SEARCH_BUDGET, max_depth=SEARCH_MAX_DEPTH):
+        super().__init__(symbol, x, y, rng)
+        self.budget_ms = budget_ms
+        self.max_depth = max_depth
+        self.last_search = None
+
+    def search_move(self, sim, request):
+        # The greedy move stands in until the first depth finishes
+        request.best_move = self.get_move(sim.board)
+        deadline = request.deadline
+        if self.budget_ms is not None:
+            deadline = min(deadline, time.monotonic() + self.budget_ms / 1000)
+
+        def publish(depth, move, value):
+            request.best_move = DIRECTIONS[move][0]
+
+        search = ExpectimaxSearch(SearchState(sim), sim.current_player, deadline, lambda: request.cancelled)
+        search.run(self.max_depth, publish)
+        self.last_search = search
+        move = request.best_move
+        if move in ['left', 'right']:
+            self.facing = move
+
+class MCTSPlayer(AIPlayer):
+    # Plays as many Monte Carlo playouts as its budget allows, optionally in several processes
+    __slots__ = ('search_rng', 'budget_ms', 'workers', 'max_playouts', 'playouts', 'search_time')
+    executors = {}  # process pools by size, shared by every MCTSPlayer
+
+    def __init__(self, symbol, x, y, rng=None, budget_ms=MCTS_BUDGET, workers=MCTS_WORKERS, max_playouts=None):
+        super().__init__(symbol, x, y, rng)
+        # Own generator for everything search_move draws, so a search on a worker thread never
+        # touches self.rng, which callers may share with the simulation on the main thread
+        self.search_rng = random.Random(self.rng.getrandbits(64))
+        self.budget_ms = budget_ms
+        self.workers = workers
+        self.max_playouts = max_playouts
+        self.playouts = 0
+        self.search_time = 0.0
+
+    def search_move(self, sim, request):
+        request.best_move = self.get_move(sim.board, self.search_rng)
+        budget_ms = (request.deadline - time.monotonic()) * 1000
+        if self.budget_ms is not None:
+            budget_ms = min(budget_ms, self.budget_ms)
+
+        if self.workers > 1:
+            move = self.search_in_processes(sim, budget_ms)
+        else:
+            def publish(move):
+                request.best_move = DIRECTIONS[move][0]
+
+            search = MonteCarloSearch(SearchState(sim), sim.current_player, self.search_rng,
+                                      time.monotonic() + budget_ms / 1000, lambda: request.cancelled)
+            move = search.run(self.max_playouts, publish)
+            self.playouts += search.playouts
+            self.search_time += search.elapsed
+
+        if move is not None:
+            request.best_move = DIRECTIONS[move][0]
+        if request.best_move in ['left', 'right']:
+            self.facing = request.best_move
+
+    def close(self):
+        # The pools are shared, so this ends them for every MCTSPlayer; a later search in
+        # processes starts a new one
+        for executor in MCTSPlayer.executors.values():
+            executor.shutdown(cancel_futures=True)
+        MCTSPlayer.executors.clear()
+
+    def search_in_processes(self, sim, budget_ms):
+        # Root parallel: independent trees, visit counts summed per root move
+        executor = MCTSPlayer.executors.get(self.workers)
+        if executor is None:
+            # Imported here, multiprocessing is only needed once a search runs in processes
+            from concurrent.futures import ProcessPoolExecutor
+            executor = MCTSPlayer.executors[self.workers] = ProcessPoolExecutor(max_workers=self.workers)
+        state = SearchState(sim)
+        futures = [executor.submit(root_parallel_visits, state, sim.current_player,
+                                        self.search_rng.getrandbits(64), budget_ms, self.max_playouts)
+                   for _ in range(self.workers)]
+        totals = {}
+        for future in futures:
+            visits, playouts, elapsed = future.result()
+            for move, count in visits.items():
+                totals[move] = totals.get(move, 0) + count
+            self.playouts += playouts
+            self.search_time += elapsed / self.workers
+        if not totals:
+            return None
+        return max(totals, key=totals.get)
+
 class Ghost:
-    def __init__(self, x, y):
+    __slots__ = ('x', 'y', 'rng', 'target_player', 'move_delay', 'moves_counter')
+
+    def __init__(self, x, y, rng=None):
         self.x = x
         self.y = y
+        self.rng = rng if rng is not None else random.Random()
         self.target_player = 0
         self.move_delay = 2
         self.moves_counter = 0
@@ -265,18 +396,26 @@ class Ghost:
         
         self.moves_counter = 0
         
-        if random.random() < 0.3:
-            self.target_player = random.randint(0, len(players) - 1)
+        if self.rng.random() < 0.3:
+            self.target_player = self.rng.randint(0, len(players) - 1)
         
         # Get player position
         target_x, target_y = players[self.target_player].position
         
+        # Follow the shortest path around obstacles when there is one
+        step = board.next_hop(self.x, self.y, target_x, target_y)
+        if step:
+            dx, dy = step
+            self.x += dx
+            self.y += dy
+            return
+        
         # Find direction
         directions = [
             ('up', -1, 0), ('down', 1, 0), 
             ('left', 0, -1), ('right', 0, 1)
         ]
-        random.shuffle(directions)
+        self.rng.shuffle(directions)
         
         best_dir = None
         best_dist = float('inf')
@@ -304,5 +443,5 @@ class Ghost:
     def check_collision(self, player):
         return self.x == player.position[0] and self.y == player.position[1]
     
-    def draw(self, screen, ghost_img):
-        screen.blit(ghost_img, (self.y * TILE_SIZE, self.x * TILE_SIZE))
\ No newline at end of file
+    def draw(self, screen, atlas, camera):
+        screen.blit(atlas.surface, camera.position(self.x, self.y), atlas.areas['ghost'])
\ No newline at end of file
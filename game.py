@@ -1,134 +1,169 @@
 import pygame
 import random
 import os
+import threading
 from constants import *
 from board import Board
-from entities import HumanPlayer, AIPlayer, Ghost
+from entities import HumanPlayer, AIPlayer
+from assets import MUSIC_FILE, PLAYER_FILES, SPRITE_FILES, SpriteLoader
+from cache import SurfaceCache
+from renderer import Renderer
+from simulation import Simulation, StepClock, SystemClock, match_generators
+from worker import MoveWorker
 from ui import Button
 
+# Zoom levels moved by each key, in or out
+ZOOM_KEYS = {pygame.K_EQUALS: 1, pygame.K_PLUS: 1, pygame.K_KP_PLUS: 1, pygame.K_MINUS: -1, pygame.K_KP_MINUS: -1}
+
 class Game:
-    def __init__(self):
+    def __init__(self, board_size=BOARD_SIZE, ai_type=AIPlayer, profiler=None, record_dir=None,
+                 replay=None, replay_speed=REPLAY_SPEED):
         pygame.init()
-        self.screen = pygame.display.set_mode((SCREEN_SIZE, SCREEN_SIZE+30))
+        self.board_size = replay.board_size if replay else board_size
+        self.ai_type = ai_type
+        # Matches are written to record_dir; a Replay is watched instead of played
+        self.record_dir = record_dir
+        self.recorder = None
+        self.replay = replay
+        self.replay_speed = replay_speed
+        self.replay_error = None
+        # Installed by the caller when profiling, F3 toggles its overlay
+        self.profiler = profiler
+        self.show_profile = False
+        self.profile_overlay = None
+        self.profile_refresh_at = 0
+        # Boards wider than VIEW_TILES scroll with the player the renderer follows
+        self.screen_size = min(self.board_size, VIEW_TILES) * TILE_SIZE
+        self.screen = pygame.display.set_mode((self.screen_size, self.screen_size + HUD_HEIGHT))
         pygame.display.set_caption("PACMAN GAME")
         self.clock = pygame.time.Clock()
-        self.load_music()
+        self.sim_clock = SystemClock()
+        # The simulation sees one time per update, which is the time a replay records
+        self.match_clock = StepClock()
+        # Decoding the mp3 would hold up the first frame
+        threading.Thread(target=self.load_music, daemon=True).start()
+        self.load_images()
         
-        # Initialize fonts
-        self.title_font = pygame.font.SysFont("asset/Blockblueprint-LV7z5.ttf", 48, bold=True)
-        self.font = pygame.font.SysFont("asset/Blockblueprint-LV7z5.ttf", 36)
-        self.small_font = pygame.font.SysFont("asset/Blockblueprint-LV7z5.ttf", 24)
+        # Initialize fonts. SysFont reads the path as a family name, finds no match and falls back
+        # to the default font after scanning the system fonts; build that same font without the scan.
+        self.title_font = self.cache.font(None, 48, bold=True)
+        self.font = self.cache.font(None, 36)
+        self.small_font = self.cache.font(None, 24)
         
         # Game state and mode
         self.state = STATE_START
         self.running = True
-        self.losing_player = None
         self.game_mode = None
         
         # Initialize buttons
         button_width, button_height = 200, 60
-        center_x = SCREEN_SIZE // 2
+        center_x = self.screen_size // 2
         
         # Mode selection buttons
         self.pvp_button = Button(
             center_x - button_width // 2, 
-            SCREEN_SIZE // 2 + 30, 
+            self.screen_size // 2 + 30, 
             button_width, button_height, 
             "vs Player", BLUE, (100, 100, 200)
         )
         
         self.pve_button = Button(
             center_x - button_width // 2, 
-            SCREEN_SIZE // 2 + 110, 
+            self.screen_size // 2 + 110, 
             button_width, button_height, 
             "vs AI", GREEN, (100, 200, 100)
         )
         
         self.restart_button = Button(
             center_x - button_width // 2, 
-            SCREEN_SIZE // 2 + 150, 
+            self.screen_size // 2 + 150, 
             button_width, button_height, 
             "Play Again", BLUE, (100, 100, 200)
         )
         
         self.quit_button = Button(
             center_x - button_width // 2, 
-            SCREEN_SIZE // 2 + 230, 
+            self.screen_size // 2 + 230, 
             button_width, button_height, 
             "Quit", (200, 50, 50), (250, 100, 100)
         )
         
-        self.load_images()
+        self.ai_worker = MoveWorker()
+        self.renderer = Renderer(self.screen, self.small_font, self.cache)
         self.init_game()
+        if self.replay:
+            self.state = STATE_PLAYING
 
     def load_music(self):
-        pygame.mixer.init()
-        music_path = os.path.join(ASSET_PATH, "pookatori-and-friends-kevin-macleod-main-version-24903-04-07.mp3")
-        pygame.mixer.music.load(music_path)
-        pygame.mixer.music.set_volume(0.5)  # Set volume (0.0 to 1.0)
-        pygame.mixer.music.play(-1)  # Loop indefinitely
+        # Runs on its own thread; without the track or an audio device the game just plays silently
+        music_path = os.path.join(ASSET_PATH, MUSIC_FILE)
+        if not os.path.exists(music_path):
+            return
+        try:
+            pygame.mixer.init()
+            pygame.mixer.music.load(music_path)
+            pygame.mixer.music.set_volume(0.5)  # Set volume (0.0 to 1.0)
+            pygame.mixer.music.play(-1)  # Loop indefinitely
+        except pygame.error:
+            pass
 
     def load_images(self):
-        self.coin_img = pygame.transform.smoothscale(
-            pygame.image.load(os.path.join(ASSET_PATH, "coin.png")).convert_alpha(), (TILE_SIZE, TILE_SIZE)
-        )
-        self.obstacle_img = pygame.transform.smoothscale(
-            pygame.image.load(os.path.join(ASSET_PATH, "obstacle.png")).convert_alpha(), (TILE_SIZE, TILE_SIZE)
-        )
-        self.magnet_img = pygame.transform.smoothscale(
-            pygame.image.load(os.path.join(ASSET_PATH, "magnet.png")).convert_alpha(), (TILE_SIZE, TILE_SIZE)
-        )
-        self.ghost_img = pygame.transform.smoothscale(
-            pygame.image.load(os.path.join(ASSET_PATH, "ghost.png")).convert_alpha(), (TILE_SIZE, TILE_SIZE)
-        )
+        # Sprites are scaled on a background thread and fetched the first time they are drawn.
+        # The start screen only shows the players, so they are queued first.
+        self.assets = SpriteLoader()
+        self.assets.prefetch([filename for filename, facing in PLAYER_FILES.values()] + list(SPRITE_FILES.values()))
+        self.cache = SurfaceCache(load_sprite=self.load_sprite, load_scaled=self.load_scaled)
 
-        self.player_base_imgs = {
-            'A': pygame.image.load(os.path.join(ASSET_PATH, "player1.png")).convert_alpha(),
-            'B': pygame.image.load(os.path.join(ASSET_PATH, "player2.png")).convert_alpha()
-        }
+    def load_sprite(self, key):
+        if key in SPRITE_FILES:
+            self.cache.add_sprite(key, self.assets.get(SPRITE_FILES[key]).convert_alpha())
+        else:
+            # ('player', symbol, facing), both facings are added together
+            filename, facing = PLAYER_FILES[key[1]]
+            self.cache.add_player(key[1], self.assets.get(filename).convert_alpha(), facing)
 
-        self.player_imgs = {
-            symbol: pygame.transform.smoothscale(img, (TILE_SIZE, TILE_SIZE)) for symbol, img in self.player_base_imgs.items()
-        }
+    def load_scaled(self, key, tile):
+        if key in SPRITE_FILES:
+            return self.assets.get(SPRITE_FILES[key], tile).convert_alpha()
+        filename, facing = PLAYER_FILES[key[1]]
+        surface = self.assets.get(filename, tile).convert_alpha()
+        return surface if key[2] == facing else pygame.transform.flip(surface, True, False)
 
     def init_game(self):
-        self.board = Board()
-        
+        self.close_recorder()
+        if self.replay:
+            self.replay.seek(0)
+            self.replay_error = None
+            self.sim = self.replay.sim
+            self.renderer.reset(self.sim.board, self.sim.players[0])
+            return
+
+        # Only the seed and the moves are recorded, so the AI draws from its own generator
+        self.match_seed = random.randrange(2 ** 63)
+        rng, player_rngs = match_generators(self.match_seed)
         if self.game_mode == MODE_PVP:
             # vs Player
             player_a = HumanPlayer('A', 0, 0) 
-            player_b = HumanPlayer('B', BOARD_SIZE - 1, BOARD_SIZE - 1)
+            player_b = HumanPlayer('B', self.board_size - 1, self.board_size - 1)
         else:
             # vs AI
             player_a = HumanPlayer('A', 0, 0)
-            player_b = AIPlayer('B', BOARD_SIZE - 1, BOARD_SIZE - 1)
+            player_b = self.ai_type('B', self.board_size - 1, self.board_size - 1, player_rngs[1])
         
         player_b.facing = 'left'
-        self.players = [player_a, player_b]
-        self.current_player = 0
-        self.losing_player = None
-        
-        # Ghost
-        while True:
-            ghost_x = random.randint(2, BOARD_SIZE - 3)
-            ghost_y = random.randint(2, BOARD_SIZE - 3)
-            
-            if (not self.board.is_obstacle(ghost_x, ghost_y) and
-                not self.board.is_coin(ghost_x, ghost_y) and
-                not self.board.is_magnet(ghost_x, ghost_y)):
-                break
-                
-        self.ghost = Ghost(ghost_x, ghost_y)
-        
-        self.invulnerable_time = 0
-        self.invulnerable_player = None
+        self.sim = Simulation([player_a, player_b], Board(self.board_size, rng=rng), self.match_clock, rng)
+        # The view stays on the human against the AI; two players sharing the keyboard each
+        # need to see themselves on their turn
+        self.renderer.reset(self.sim.board, None if self.game_mode == MODE_PVP else player_a)
+        self.ai_worker.cancel()
+        self.ai_move_at = None
 
     def draw_start_screen(self):
         self.screen.fill(WHITE)
         
         # Draw title
-        title_surf = self.title_font.render("PACMAN GAME", True, BLUE)
-        title_rect = title_surf.get_rect(center=(SCREEN_SIZE // 2, SCREEN_SIZE // 4))
+        title_surf = self.cache.text(self.title_font, "PACMAN GAME", BLUE)
+        title_rect = title_surf.get_rect(center=(self.screen_size // 2, self.screen_size // 4))
         self.screen.blit(title_surf, title_rect)
         
         # Draw instructions
@@ -141,8 +176,8 @@ class Game:
         ]
         
         for i, text in enumerate(instructions):
-            text_surf = self.small_font.render(text, True, BLACK)
-            text_rect = text_surf.get_rect(center=(SCREEN_SIZE // 2, SCREEN_SIZE // 3 + i * 30))
+            text_surf = self.cache.text(self.small_font, text, BLACK)
+            text_rect = text_surf.get_rect(center=(self.screen_size // 2, self.screen_size // 3 + i * 30))
             self.screen.blit(text_surf, text_rect)
         
         # Draw mode selection buttons
@@ -154,33 +189,33 @@ class Game:
         self.pve_button.draw(self.screen, self.font)
         
         # Draw player icons for visual appeal
-        if hasattr(self, 'player_imgs'):
-            player_a_img = self.player_imgs['A']
-            player_b_img = self.player_imgs['B']
-            self.screen.blit(player_a_img, (SCREEN_SIZE // 4 - TILE_SIZE // 2, SCREEN_SIZE // 2 + 200))
-            self.screen.blit(pygame.transform.flip(player_b_img, True, False), 
-                           (3 * SCREEN_SIZE // 4 - TILE_SIZE // 2, SCREEN_SIZE // 2 + 200))
+        self.screen.blit(self.cache.player('A', 'right'), (self.screen_size // 4 - TILE_SIZE // 2, self.screen_size // 2 + 200))
+        self.screen.blit(self.cache.player('B', 'right'), 
+                         (3 * self.screen_size // 4 - TILE_SIZE // 2, self.screen_size // 2 + 200))
         
     def draw_game_over_screen(self):
         self.screen.fill(WHITE)
         
         # Draw Game Over
-        title_surf = self.title_font.render("GAME OVER", True, BLUE)
-        title_rect = title_surf.get_rect(center=(SCREEN_SIZE // 2, SCREEN_SIZE // 6))
+        title_surf = self.cache.text(self.title_font, "GAME OVER", BLUE)
+        title_rect = title_surf.get_rect(center=(self.screen_size // 2, self.screen_size // 6))
         self.screen.blit(title_surf, title_rect)
         
-        player_a, player_b = self.players
+        player_a, player_b = self.sim.players
         
+        if self.replay_error:
+            winner_text = "Replay Stopped"
+            winner_color = RED
         # Running out of lives
-        if self.losing_player:
-            if self.losing_player.symbol == 'A':
+        elif self.sim.losing_player:
+            if self.sim.losing_player.symbol == 'A':
                 winner_text = "Player B Wins!"
                 winner_color = YELLOW
             else:
                 winner_text = "Player A Wins!"
                 winner_color = GREEN
         # All Coins are collected
-        elif len(self.board.coins) == 0:
+        elif self.sim.board.coins_left() == 0:
             if player_a.score > player_b.score:
                 winner_text = "Player A Wins!"
                 winner_color = GREEN
@@ -192,14 +227,18 @@ class Game:
                 winner_color = BLUE
         
         # Display winner
-        winner_surf = self.title_font.render(winner_text, True, winner_color)
-        winner_rect = winner_surf.get_rect(center=(SCREEN_SIZE // 2, SCREEN_SIZE // 3)) 
+        winner_surf = self.cache.text(self.title_font, winner_text, winner_color)
+        winner_rect = winner_surf.get_rect(center=(self.screen_size // 2, self.screen_size // 3)) 
         self.screen.blit(winner_surf, winner_rect)
         
-        if self.losing_player:
-            reason = f"Player {self.losing_player.symbol} ran out of lives!"
-            reason_surf = self.font.render(reason, True, RED)
-            reason_rect = reason_surf.get_rect(center=(SCREEN_SIZE // 2, SCREEN_SIZE // 2.3))
+        reason_surf = None
+        if self.replay_error:
+            reason_surf = self.cache.text(self.small_font, f"Recording does not match at {self.replay_error}", RED)
+        elif self.sim.losing_player:
+            reason = f"Player {self.sim.losing_player.symbol} ran out of lives!"
+            reason_surf = self.cache.text(self.font, reason, RED)
+        if reason_surf:
+            reason_rect = reason_surf.get_rect(center=(self.screen_size // 2, self.screen_size // 2.3))
             self.screen.blit(reason_surf, reason_rect)
         
         # Display scores and lives
@@ -209,8 +248,8 @@ class Game:
         ]
         
         for i, text in enumerate(score_texts):
-            text_surf = self.font.render(text, True, BLACK)
-            text_rect = text_surf.get_rect(center=(SCREEN_SIZE // 2, SCREEN_SIZE // 2 + i * 50))
+            text_surf = self.cache.text(self.font, text, BLACK)
+            text_rect = text_surf.get_rect(center=(self.screen_size // 2, self.screen_size // 2 + i * 50))
             self.screen.blit(text_surf, text_rect)
         
         # Draw buttons
@@ -222,60 +261,60 @@ class Game:
         self.quit_button.draw(self.screen, self.font)
         
         # Draw player icons for visual appeal
-        if hasattr(self, 'player_imgs'):
-            player_a_img = self.player_imgs['A']
-            player_b_img = self.player_imgs['B']
-            self.screen.blit(player_a_img, (SCREEN_SIZE // 4 - TILE_SIZE // 2, SCREEN_SIZE * 0.7))
-            self.screen.blit(pygame.transform.flip(player_b_img, True, False), 
-                           (3 * SCREEN_SIZE // 4 - TILE_SIZE // 2, SCREEN_SIZE * 0.7))
+        self.screen.blit(self.cache.player('A', 'right'), (self.screen_size // 4 - TILE_SIZE // 2, self.screen_size * 0.7))
+        self.screen.blit(self.cache.player('B', 'right'), 
+                         (3 * self.screen_size // 4 - TILE_SIZE // 2, self.screen_size * 0.7))
 
     def draw_playing_screen(self):
-        self.screen.fill(WHITE)
-        self.board.draw(self.screen, self.coin_img, self.obstacle_img, self.magnet_img)
-        
-        self.ghost.draw(self.screen, self.ghost_img)
-        
-        # Draw players
-        for p in self.players:
-            # Make player blink when invulnerable
-            if p == self.invulnerable_player:
-                if (pygame.time.get_ticks() // 200) % 2 == 0:  # Blink every 200ms
-                    p.draw(self.screen, self.player_imgs[p.symbol])
-            else:
-                p.draw(self.screen, self.player_imgs[p.symbol])
-            
-        player_a, player_b = self.players
-        
-        # Show magnet status in the score display
-        magnet_a_text = f" [MAGNET: {player_a.magnet_moves_left}]" if player_a.magnet_active else ""
-        magnet_b_text = f" [MAGNET: {player_b.magnet_moves_left}]" if player_b.magnet_active else ""
-        
-        score_a = self.small_font.render(f"Player A: {player_a.score}{magnet_a_text} Lives: {player_a.lives}", True, BLACK)
-        score_b = self.small_font.render(f"Player B: {player_b.score}{magnet_b_text} Lives: {player_b.lives}", True, BLACK)
-        
-        self.screen.blit(score_a, (10, SCREEN_SIZE))
-        self.screen.blit(score_b, (SCREEN_SIZE - score_b.get_width() - 10, SCREEN_SIZE))
-        
-        current = self.small_font.render(f"Player {self.players[self.current_player].symbol}'s Turn", True, BLUE)
-        current_rect = current.get_rect(center=(SCREEN_SIZE // 2, SCREEN_SIZE + 15))
-        self.screen.blit(current, current_rect)
+        # Make player blink when invulnerable
+        hidden = []
+        if self.sim.invulnerable_player and (pygame.time.get_ticks() // 200) % 2 == 1:  # Blink every 200ms
+            hidden.append(self.sim.invulnerable_player)
+        return self.renderer.draw(self.sim, hidden)
 
-    def check_game_end(self):
-        if len(self.board.coins) == 0:
-            return True
-        
-        # Runs out of lives
-        for player in self.players:
-            if player.lives <= 0:
-                self.losing_player = player
-                return True
-                
-        return False
+    def draw_profile_overlay(self):
+        # Re-sorting every sample each frame would show up in the numbers, so refresh a few times a second
+        now = pygame.time.get_ticks()
+        if self.profile_overlay is None or now >= self.profile_refresh_at:
+            font = self.cache.font("monospace", 14)
+            lines = [font.render(line, True, WHITE) for line in self.profiler.overlay_lines()]
+            width = max(line.get_width() for line in lines) + 8
+            height = sum(line.get_height() for line in lines) + 8
+            if self.profile_overlay is not None:
+                # Never shrink, the partial redraw would leave the old edges behind
+                width = max(width, self.profile_overlay.get_width())
+                height = max(height, self.profile_overlay.get_height())
+            overlay = pygame.Surface((width, height))
+            overlay.fill(BLACK)
+            y = 4
+            for line in lines:
+                overlay.blit(line, (4, y))
+                y += line.get_height()
+            self.profile_overlay = overlay
+            self.profile_refresh_at = now + PROFILE_REFRESH
+        return self.screen.blit(self.profile_overlay, (0, 0))
 
     def handle_events(self):
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 self.running = False
+
+            elif event.type == pygame.VIDEOEXPOSE:
+                self.renderer.invalidate()
+
+            elif event.type == pygame.KEYDOWN and event.key in (pygame.K_LEFT, pygame.K_RIGHT) and self.replay:
+                self.seek_replay(self.replay.turn + (REPLAY_SEEK if event.key == pygame.K_RIGHT else -REPLAY_SEEK))
+                self.renderer.invalidate()
+
+            elif event.type == pygame.KEYDOWN and event.key in ZOOM_KEYS:
+                self.renderer.zoom(ZOOM_KEYS[event.key])
+
+            elif event.type == pygame.MOUSEWHEEL and event.y:
+                self.renderer.zoom(1 if event.y > 0 else -1)
+
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_F3 and self.profiler:
+                self.show_profile = not self.show_profile
+                self.renderer.invalidate()
                 
             elif event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
                 pos = pygame.mouse.get_pos()
@@ -297,70 +336,101 @@ class Game:
                     elif self.quit_button.is_clicked(pos):
                         self.running = False
 
-    def handle_ghost_collision(self):
-        # Check if ghost collided with a player
-        for player in self.players:
-            if (self.ghost.check_collision(player) and 
-                player != self.invulnerable_player):
-                # Use the proper method instead of direct attribute access
-                remaining_lives = player.decrease_life()
-                self.invulnerable_player = player
-                self.invulnerable_time = pygame.time.get_ticks()
-                
-                # Use property setter
-                if player.symbol == 'A':
-                    player.position = (0, 0)
-                else:
-                    player.position = (BOARD_SIZE - 1, BOARD_SIZE - 1)
-                    player.facing = 'left'
-                
-                # Check if player lost all lives
-                if remaining_lives <= 0:
-                    self.losing_player = player
+    def close_recorder(self):
+        if self.recorder:
+            self.recorder.close()
+            self.recorder = None
+
+    def record_turn(self, move, undo):
+        # The file is only created once the match has a turn in it
+        if self.recorder is None:
+            from replay import ReplayRecorder
+            path = os.path.join(self.record_dir, f"{self.match_seed}.replay")
+            self.recorder = ReplayRecorder(path, self.match_seed, self.board_size)
+        self.recorder.record(self.sim, move, undo)
+
+    def seek_replay(self, turn):
+        # A recording these rules no longer play back the same way ends the replay with the error shown
+        from replay import ReplayMismatch
+        try:
+            self.replay.seek(turn)
+        except ReplayMismatch as e:
+            self.replay_error = str(e)
+            self.state = STATE_GAME_OVER
+            return
+        self.replay_error = None
+        self.state = STATE_GAME_OVER if self.sim.check_game_end() else STATE_PLAYING
+
+    def update_replay(self):
+        # Recorded turns stand in for input
+        self.seek_replay(self.replay.turn + self.replay_speed)
 
     def update(self):
-        if self.state == STATE_PLAYING:
-            if self.invulnerable_player and pygame.time.get_ticks() - self.invulnerable_time > 3000:  # 3 seconds of invulnerability
-                self.invulnerable_player = None
+        if self.state == STATE_PLAYING and self.replay:
+            self.update_replay()
+        elif self.state == STATE_PLAYING:
+            self.match_clock.advance(self.sim_clock.now() - self.match_clock.now())
+            self.sim.tick()
                 
-            player = self.players[self.current_player]
+            player = self.sim.players[self.sim.current_player]
             
             if isinstance(player, HumanPlayer):
                 keys = pygame.key.get_pressed()
-                move = player.get_move(keys, self.board)
+                move = player.get_move(keys, self.sim.board)
             else:
-                pygame.time.delay(300)
-                move = player.get_move(self.board)
+                # The move is searched on the worker thread while the think time runs down
+                now = self.sim_clock.now()
+                move = None
+                if self.ai_move_at is None:
+                    self.ai_move_at = now + AI_THINK_TIME
+                    self.ai_worker.start(player, self.sim, AI_MOVE_BUDGET)
+                elif now >= self.ai_move_at:
+                    done, move = self.ai_worker.poll()
+                    if done:
+                        self.ai_move_at = None
 
-            if move:
-                moved = player.move(move, self.board)
-                if moved:
-                    # Move ghost
-                    self.ghost.move(self.players, self.board)
-                    self.handle_ghost_collision()
-                    
-                    # Switch to other player's turn
-                    self.current_player = 1 - self.current_player
+            # Moves the ghost and switches turns when the move is valid
+            undo = self.sim.make_move(move)
+            if undo is not None and self.record_dir:
+                self.record_turn(move, undo)
 
-            if self.check_game_end():
+            if self.sim.check_game_end():
                 self.state = STATE_GAME_OVER
+                self.close_recorder()
 
     def draw(self):
+        if self.state == STATE_PLAYING:
+            # Only push the tiles that changed to the display
+            rects = self.draw_playing_screen()
+            if self.show_profile:
+                rects.append(self.draw_profile_overlay())
+            pygame.display.update(rects)
+            return
+
         if self.state == STATE_START:
             self.draw_start_screen()
-        elif self.state == STATE_PLAYING:
-            self.draw_playing_screen()
         elif self.state == STATE_GAME_OVER:
             self.draw_game_over_screen()
+        if self.show_profile:
+            self.draw_profile_overlay()
             
         pygame.display.flip()
 
     def run(self):
+        # Draw every frame, advance the simulation in fixed SIM_STEP slices
+        lag = 0
         while self.running:
-            self.clock.tick(10)
+            lag = min(lag + self.clock.tick(FPS), SIM_STEP * MAX_SIM_STEPS_PER_FRAME)
             self.handle_events()
-            self.update()
+            while lag >= SIM_STEP:
+                self.update()
+                lag -= SIM_STEP
             self.draw()
 
+        self.close_recorder()
+        self.ai_worker.shutdown()
+        for player in self.sim.players:
+            player.close()
+        self.assets.shutdown()
         pygame.quit()
 
@@ -0,0 +1,90 @@
+import argparse
+import os
+import random
+import time
+from board import Board, board_size_arg
+from constants import AI_MOVE_BUDGET, BOARD_SIZE, HEADLESS_TURN_TIME, MAX_TURNS
+from entities import AIPlayer
+from profiler import Profiler
+from replay import ReplayRecorder
+from simulation import Simulation, StepClock, match_generators
+from worker import MoveRequest
+
+def run_match(player_types=(AIPlayer, AIPlayer), board_size=BOARD_SIZE, max_turns=MAX_TURNS, seed=None, recorder=None):
+    # Generators seeded per match, so a seed replays the same match in any process or thread
+    rng, player_rngs = match_generators(seed)
+    board = Board(board_size, rng=rng)
+    player_a = player_types[0]('A', 0, 0, rng=player_rngs[0])
+    player_b = player_types[1]('B', board_size - 1, board_size - 1, rng=player_rngs[1])
+    player_b.facing = 'left'
+
+    clock = StepClock(HEADLESS_TURN_TIME)
+    sim = Simulation([player_a, player_b], board, clock, rng)
+
+    while not sim.check_game_end() and sim.turns < max_turns:
+        clock.advance()
+        sim.tick()
+        player = sim.players[sim.current_player]
+        request = MoveRequest(AI_MOVE_BUDGET)
+        player.search_move(sim, request)
+        undo = sim.make_move(request.best_move)
+        if undo is None:
+            # Nowhere to go, hand the turn over instead of spinning forever
+            sim.current_player = 1 - sim.current_player
+            sim.turns += 1
+        if recorder is not None:
+            recorder.record(sim, request.best_move, undo)
+    for player in sim.players:
+        player.close()
+
+    return {
+        'winner': sim.winner(),
+        'scores': [p.score for p in sim.players],
+        'lives': [p.lives for p in sim.players],
+        'turns': sim.turns,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Run AI vs AI matches without a window")
+    parser.add_argument("--matches", type=int, default=100)
+    parser.add_argument("--size", type=board_size_arg, default=BOARD_SIZE)
+    parser.add_argument("--max-turns", type=int, default=MAX_TURNS)
+    parser.add_argument("--seed", type=int, default=None, help="seed of the first match, later matches count up")
+    parser.add_argument("--profile", metavar="PATH", help="time the hot paths and write the stats to PATH")
+    parser.add_argument("--record", metavar="DIR", help="write a replay of every match to DIR")
+    args = parser.parse_args()
+
+    profiler = None
+    if args.profile:
+        profiler = Profiler()
+        profiler.install()
+
+    first_seed = args.seed
+    if args.record:
+        os.makedirs(args.record, exist_ok=True)
+        if first_seed is None:
+            # A replay re-simulates from its seed, so recorded matches always get one
+            first_seed = random.randrange(2 ** 32)
+
+    wins = [0, 0]
+    ties = 0
+    start = time.perf_counter()
+    for i in range(args.matches):
+        seed = None if first_seed is None else first_seed + i
+        recorder = ReplayRecorder(os.path.join(args.record, f"{seed}.replay"), seed, args.size) if args.record else None
+        result = run_match(board_size=args.size, max_turns=args.max_turns, seed=seed, recorder=recorder)
+        if recorder:
+            recorder.close()
+        if result['winner'] is None:
+            ties += 1
+        else:
+            wins[result['winner']] += 1
+    elapsed = time.perf_counter() - start
+
+    print(f"Player A wins: {wins[0]}  Player B wins: {wins[1]}  Ties: {ties}")
+    print(f"{args.matches} matches in {elapsed:.2f}s ({args.matches / elapsed:.1f} matches/s)")
+    if profiler:
+        profiler.dump(args.profile)
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,33 @@
-import pygame
-import random
+import argparse
 import os
 from constants import *
-from board import Board
-from entities import HumanPlayer, AIPlayer, Ghost
-from ui import Button
+from board import board_size_arg
+from entities import AIPlayer, SearchPlayer, MCTSPlayer
 from game import Game
 
 if __name__ == "__main__":
-    Game().run()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Two-player coin collecting game")
+    parser.add_argument("--size", type=board_size_arg, default=BOARD_SIZE, help="board width and height in tiles")
+    parser.add_argument("--ai", choices=["greedy", "search", "mcts"], default="greedy", help="opponent in vs AI mode")
+    parser.add_argument("--profile", nargs="?", const="profile.json", metavar="PATH",
+                        help="time the hot paths (F3 shows them in game) and write the stats to PATH at exit")
+    parser.add_argument("--record", metavar="DIR", help="write a replay of every match to DIR")
+    parser.add_argument("--replay", metavar="PATH", help="watch a recorded match, arrow keys seek")
+    parser.add_argument("--speed", type=int, default=REPLAY_SPEED, help="recorded turns per simulation step")
+    args = parser.parse_args()
+    if args.record:
+        os.makedirs(args.record, exist_ok=True)
+    ai_types = {"greedy": AIPlayer, "search": SearchPlayer, "mcts": MCTSPlayer}
+    # The profiler and replays are only imported when asked for
+    profiler = None
+    if args.profile:
+        from profiler import Profiler
+        profiler = Profiler()
+        profiler.install(Game)
+    replay = None
+    if args.replay:
+        from replay import load_replay
+        replay = load_replay(args.replay)
+    Game(args.size, ai_types[args.ai], profiler, args.record, replay, args.speed).run()
+    if profiler:
+        profiler.dump(args.profile)
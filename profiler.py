@@ -0,0 +1,159 @@
+import json
+import time
+from math import log10
+from board import Board, UNREACHABLE
+from entities import Player, AIPlayer, RandomPlayer, SearchPlayer, MCTSPlayer, Ghost
+
+PERCENTILES = (50, 95, 99)
+# Histogram buckets: BUCKETS_PER_DECADE to each power of ten from SMALLEST_MS up to
+# SMALLEST_MS * 10 ** DECADES (100 s), so a percentile is within about 6% of the real time
+SMALLEST_MS = 0.0001
+DECADES = 9
+BUCKETS_PER_DECADE = 20
+
+def field_nodes(field):
+    # Tiles a full distance-field BFS reached
+    return len(field) - field.count(UNREACHABLE)
+
+def returned_nodes(nodes):
+    return nodes
+
+# (owner, method, counter name, how many BFS nodes a call expanded from its return value)
+HOT_PATHS = [
+    (AIPlayer, 'get_move', None, None),
+    (RandomPlayer, 'get_move', None, None),
+    (SearchPlayer, 'search_move', None, None),
+    (MCTSPlayer, 'search_move', None, None),
+    (Ghost, 'move', None, None),
+    # Player.move and the simulation both go through make_move
+    (Player, 'make_move', None, None),
+    (Board, 'draw', None, None),
+    (Board, 'compute_distance_field', 'bfs_nodes', field_nodes),
+    (Board, '_repair_distance_field', 'bfs_nodes', returned_nodes),
+    (Board, '_search_next_hops', 'bfs_nodes', returned_nodes),
+]
+
+class Histogram:
+    # Call times in fixed log-spaced buckets, so memory and summary() stay the same size
+    # however long the game runs. Bucket 0 holds times under SMALLEST_MS, the last anything
+    # over the top; calls, total and max are exact.
+    def __init__(self):
+        self.counts = [0] * (DECADES * BUCKETS_PER_DECADE + 2)
+        self.calls = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, ms):
+        if ms < SMALLEST_MS:
+            bucket = 0
+        else:
+            bucket = min(int(log10(ms / SMALLEST_MS) * BUCKETS_PER_DECADE) + 1, len(self.counts) - 1)
+        self.counts[bucket] += 1
+        self.calls += 1
+        self.total += ms
+        if ms > self.max:
+            self.max = ms
+
+    def percentile(self, pct):
+        # Nearest rank, reported as the geometric middle of its bucket
+        if not self.calls:
+            return 0.0
+        rank = max(1, -(-pct * self.calls // 100))
+        seen = 0
+        for bucket, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                break
+        if bucket == 0:
+            return min(SMALLEST_MS / 2, self.max)
+        return min(SMALLEST_MS * 10 ** ((bucket - 0.5) / BUCKETS_PER_DECADE), self.max)
+
+    def reset(self):
+        self.counts = [0] * len(self.counts)
+        self.calls = 0
+        self.total = 0.0
+        self.max = 0.0
+
+class Profiler:
+    # Opt-in timing of hot methods. Nothing is wrapped until install(), so a game
+    # that never creates a Profiler runs the plain methods with no overhead.
+    def __init__(self):
+        self.samples = {}
+        self.counters = {}
+        self.originals = []
+
+    def wrap(self, owner, name, counter=None, nodes=None):
+        original = owner.__dict__[name]
+        label = f"{owner.__name__}.{name}"
+        record = self.samples.setdefault(label, Histogram()).add
+        counters = self.counters
+        clock = time.perf_counter
+
+        if counter is None:
+            def timed(*args, **kwargs):
+                start = clock()
+                result = original(*args, **kwargs)
+                record((clock() - start) * 1000)
+                return result
+        else:
+            def timed(*args, **kwargs):
+                start = clock()
+                result = original(*args, **kwargs)
+                record((clock() - start) * 1000)
+                counters[counter] = counters.get(counter, 0) + (nodes(result) or 0)
+                return result
+
+        timed.__name__ = original.__name__
+        timed.__wrapped__ = original
+        setattr(owner, name, timed)
+        self.originals.append((owner, name, original))
+
+    def install(self, game_type=None):
+        # Wraps the hot paths, plus Game.update and Game.draw when a Game class is given
+        if self.originals:
+            return
+        for owner, name, counter, nodes in HOT_PATHS:
+            self.wrap(owner, name, counter, nodes)
+        if game_type is not None:
+            self.wrap(game_type, 'update')
+            self.wrap(game_type, 'draw')
+
+    def uninstall(self):
+        for owner, name, original in reversed(self.originals):
+            setattr(owner, name, original)
+        self.originals = []
+
+    def reset(self):
+        for histogram in self.samples.values():
+            histogram.reset()
+        self.counters.clear()
+
+    def summary(self):
+        timers = {}
+        for label, histogram in self.samples.items():
+            if not histogram.calls:
+                continue
+            stats = {
+                'calls': histogram.calls,
+                'total_ms': round(histogram.total, 3),
+                'mean_ms': round(histogram.total / histogram.calls, 4),
+            }
+            for pct in PERCENTILES:
+                stats[f'p{pct}_ms'] = round(histogram.percentile(pct), 4)
+            stats['max_ms'] = round(histogram.max, 4)
+            timers[label] = stats
+        return {'timers': timers, 'counters': dict(self.counters)}
+
+    def overlay_lines(self):
+        summary = self.summary()
+        lines = [f"{'':30}{'calls':>7}{'p50':>8}{'p95':>8}{'p99':>8}"]
+        for label, stats in sorted(summary['timers'].items(), key=lambda item: -item[1]['total_ms']):
+            lines.append(f"{label[:29]:30}{stats['calls']:>7}{stats['p50_ms']:>8.2f}"
+                         f"{stats['p95_ms']:>8.2f}{stats['p99_ms']:>8.2f}")
+        for name, value in sorted(summary['counters'].items()):
+            lines.append(f"{name}: {value}")
+        return lines
+
+    def dump(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.summary(), f, indent=2)
@@ -0,0 +1,156 @@
+import pygame
+from camera import Camera
+from constants import TILE_SIZE, HUD_HEIGHT, WHITE, BLACK, BLUE, ZOOM_TILE_SIZES
+
+class Renderer:
+    # Draws the playing screen, redrawing only the tiles that changed since the last frame.
+    # The view above the HUD shows the part of the board the camera is on.
+    def __init__(self, screen, font, cache):
+        self.screen = screen
+        self.font = font
+        self.cache = cache
+        self.board = None
+        self.camera = None
+        self.followed = None
+        self.tile = TILE_SIZE
+        self.background = None
+        self.entity_rects = []
+        self.last_frame = None
+        self.last_hud = None
+        self.full_redraw = True
+        view_height = screen.get_height() - HUD_HEIGHT
+        self.view_rect = pygame.Rect(0, 0, screen.get_width(), view_height)
+        self.hud_rect = pygame.Rect(0, view_height, screen.get_width(), HUD_HEIGHT)
+
+    def reset(self, board, followed=None):
+        # The camera keeps followed in view, or whoever's turn it is when None. Following one
+        # player keeps the view still while the other moves, instead of rebuilding it every turn.
+        self.board = board
+        self.followed = followed
+        board.track_cleared()
+        self.camera = Camera(self.view_rect.width, self.view_rect.height, board.size, self.tile)
+        # Built on the first frame of the match, so no sprite is needed before then
+        self.background = None
+        self.invalidate()
+
+    def zoom(self, steps):
+        # Moves `steps` zoom levels in (positive) or out
+        levels = ZOOM_TILE_SIZES
+        index = levels.index(self.tile) if self.tile in levels else levels.index(TILE_SIZE)
+        tile = levels[max(0, min(len(levels) - 1, index + steps))]
+        if tile != self.tile:
+            self.tile = tile
+            if self.camera is not None:
+                self.camera.zoom(tile)
+                self.background = None
+            self.invalidate()
+
+    def draw_background(self):
+        # Grid lines and obstacles never change during a match, render the view of them
+        # once and again only when the camera moves
+        self.background = pygame.Surface(self.view_rect.size).convert()
+        self.background.fill(WHITE)
+        self.board.draw_static(self.background, self.cache.atlas(self.camera.tile), self.camera)
+
+    def invalidate(self):
+        self.full_redraw = True
+
+    def tile_rect(self, rect):
+        # Grow a rect to whole tiles, so every tile is either fully redrawn or left alone
+        tile = self.camera.tile
+        left = rect.left // tile * tile
+        top = rect.top // tile * tile
+        right = -(-rect.right // tile) * tile
+        bottom = -(-rect.bottom // tile) * tile
+        return pygame.Rect(left, top, right - left, bottom - top).clip(self.view_rect)
+
+    def entity_rect(self, x, y, aura_radius=0):
+        rect = self.camera.tile_rect(x, y)
+        if aura_radius:
+            tile = self.camera.tile
+            rect = rect.inflate(2 * aura_radius * tile, 2 * aura_radius * tile)
+        return self.tile_rect(rect)
+
+    def draw(self, sim, hidden=()):
+        # Returns the screen rects that were redrawn, for pygame.display.update
+        camera = self.camera
+        x, y = (self.followed or sim.players[sim.current_player]).position
+        if camera.follow(x, y):
+            self.background = None
+            self.invalidate()
+        if self.background is None:
+            self.draw_background()
+        atlas = self.cache.atlas(camera.tile)
+        players = sim.players
+        ghost = sim.ghost
+        frame = (
+            tuple((p.position, p.facing, p.magnet_active, p.magnet_moves_left, p in hidden) for p in players),
+            (ghost.x, ghost.y),
+        )
+        hud = self.hud_lines(sim)
+        cleared = self.board.cleared_tiles
+        if not self.full_redraw and not cleared and frame == self.last_frame and hud == self.last_hud:
+            return []
+
+        rects = [self.entity_rect(ghost.x, ghost.y)]
+        for p in players:
+            x, y = p.position
+            rects.append(self.entity_rect(x, y, p.magnet_radius if p.magnet_active else 0))
+
+        if self.full_redraw:
+            self.screen.blit(self.background, (0, 0))
+            self.board.draw(self.screen, atlas, camera)
+            dirty = [self.view_rect]
+        else:
+            # Last frame's sprites, this frame's sprites and any tiles emptied since
+            dirty = self.entity_rects + rects
+            for idx in cleared:
+                dirty.append(self.entity_rect(*divmod(idx, self.board.size)))
+            for rect in dirty:
+                self.screen.blit(self.background, rect, rect)
+            self.board.draw(self.screen, atlas, camera, dirty)
+
+        # Keep magnet auras on the board side of the HUD
+        self.screen.set_clip(self.view_rect)
+        ghost.draw(self.screen, atlas, camera)
+        for p in players:
+            if p not in hidden:
+                p.draw(self.screen, self.cache, camera)
+        self.screen.set_clip(None)
+
+        if self.full_redraw or hud != self.last_hud:
+            self.draw_hud(hud)
+            dirty.append(self.hud_rect)
+
+        cleared.clear()
+        self.entity_rects = rects
+        self.last_frame = frame
+        self.last_hud = hud
+        self.full_redraw = False
+        return dirty
+
+    def hud_lines(self, sim):
+        player_a, player_b = sim.players
+
+        # Show magnet status in the score display
+        magnet_a_text = f" [MAGNET: {player_a.magnet_moves_left}]" if player_a.magnet_active else ""
+        magnet_b_text = f" [MAGNET: {player_b.magnet_moves_left}]" if player_b.magnet_active else ""
+
+        return (
+            f"Player A: {player_a.score}{magnet_a_text} Lives: {player_a.lives}",
+            f"Player B: {player_b.score}{magnet_b_text} Lives: {player_b.lives}",
+            f"Player {sim.players[sim.current_player].symbol}'s Turn",
+        )
+
+    def draw_hud(self, hud):
+        score_a_text, score_b_text, current_text = hud
+        self.screen.fill(WHITE, self.hud_rect)
+
+        score_a = self.cache.text(self.font, score_a_text, BLACK)
+        score_b = self.cache.text(self.font, score_b_text, BLACK)
+        self.screen.blit(score_a, (10, self.hud_rect.top))
+        self.screen.blit(score_b, (self.hud_rect.right - score_b.get_width() - 10, self.hud_rect.top))
+
+        current = self.cache.text(self.font, current_text, BLUE)
+        current_rect = current.get_rect(center=self.hud_rect.center)
+        self.screen.blit(current, current_rect)
@@ -0,0 +1,175 @@
+import argparse
+import os
+import struct
+import sys
+import time
+from board import Board
+from constants import REPLAY_KEYFRAME_INTERVAL
+from entities import Player
+from simulation import Simulation, StepClock, match_generators
+
+# A replay file is this header (magic, format version, board size, match seed) followed by
+# one record per turn taken: simulated ms, player index, move, the ghost's step during the
+# turn and how many coins and magnets the move picked up. Move PASS is a headless player
+# with nowhere to go handing the turn over. A crash loses at most a partial record.
+MAGIC = b'PMRP'
+VERSION = 1
+HEADER = struct.Struct('<4sHHq')
+RECORD = struct.Struct('<IBbbbB')
+MOVES = ('up', 'down', 'left', 'right')
+MOVE_INDEX = {move: i for i, move in enumerate(MOVES)}
+PASS = -1
+
+class ReplayMismatch(Exception):
+    # The current rules played a recorded turn differently
+    pass
+
+class ReplayRecorder:
+    # Streams a match to disk as it is played
+    def __init__(self, path, seed, board_size):
+        self.path = path
+        self.file = open(path, 'wb')
+        self.file.write(HEADER.pack(MAGIC, VERSION, board_size, seed))
+        self.turns = 0
+
+    def record(self, sim, move, undo):
+        # undo is what sim.make_move(move) returned, None for a turn handed over
+        if undo is None:
+            self.file.write(RECORD.pack(sim.clock.now(), 1 - sim.current_player, PASS, 0, 0, 0))
+            self.turns += 1
+            return
+        current_player, player_undo, ghost_before = undo[:3]
+        ghost = sim.ghost
+        self.file.write(RECORD.pack(sim.clock.now(), current_player, MOVE_INDEX[move],
+                                    ghost.x - ghost_before[0], ghost.y - ghost_before[1], len(player_undo[5])))
+        self.turns += 1
+
+    def close(self):
+        self.file.close()
+
+def replay_match(seed, board_size):
+    # The match a recording started from, with plain players for the recorded moves
+    rng, _ = match_generators(seed)
+    board = Board(board_size, rng=rng)
+    player_b = Player('B', board_size - 1, board_size - 1)
+    player_b.facing = 'left'
+    return Simulation([Player('A', 0, 0), player_b], board, StepClock(), rng)
+
+class Replay:
+    # Re-simulates a recording from its seed, checking every turn against the record.
+    # A keyframe is kept every keyframe_interval turns, so seeking replays at most that many.
+    def __init__(self, data, keyframe_interval=REPLAY_KEYFRAME_INTERVAL):
+        magic, version, self.board_size, self.seed = HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"not a version {VERSION} replay")
+        body = memoryview(data)[HEADER.size:]
+        self.records = list(RECORD.iter_unpack(body[:len(body) - len(body) % RECORD.size]))
+        self.keyframe_interval = keyframe_interval
+        self.sim = replay_match(self.seed, self.board_size)
+        self.turn = 0
+        self.keyframes = [self.keyframe()]
+
+    def keyframe(self):
+        sim = self.sim
+        return sim.pack(), sim.rng.getstate(), sim.clock.now(), [p.facing for p in sim.players]
+
+    def restore(self, keyframe, turn):
+        packed, rng_state, now, facings = keyframe
+        sim = self.sim
+        sim.unpack(packed)
+        sim.rng.setstate(rng_state)
+        sim.clock.advance(now - sim.clock.now())
+        for player, facing in zip(sim.players, facings):
+            player.facing = facing
+        self.turn = turn
+
+    def step(self):
+        # Plays the next recorded turn, False once the recording has run out
+        if self.turn >= len(self.records):
+            return False
+        now, player, move, ghost_dx, ghost_dy, pickups = self.records[self.turn]
+        sim = self.sim
+        sim.clock.advance(now - sim.clock.now())
+        sim.tick()
+        if player != sim.current_player:
+            raise ReplayMismatch(f"turn {self.turn}: player {player} moved on player {sim.current_player}'s turn")
+        if move == PASS:
+            sim.current_player = 1 - sim.current_player
+            sim.turns += 1
+        else:
+            ghost_x, ghost_y = sim.ghost.x, sim.ghost.y
+            undo = sim.make_move(MOVES[move])
+            if undo is None:
+                raise ReplayMismatch(f"turn {self.turn}: {MOVES[move]} is not a legal move")
+            played = (sim.ghost.x - ghost_x, sim.ghost.y - ghost_y, len(undo[1][5]))
+            if played != (ghost_dx, ghost_dy, pickups):
+                raise ReplayMismatch(f"turn {self.turn}: ghost step and pickups {played}, "
+                                     f"recorded {(ghost_dx, ghost_dy, pickups)}")
+        self.turn += 1
+        if self.turn == len(self.keyframes) * self.keyframe_interval:
+            self.keyframes.append(self.keyframe())
+        return True
+
+    def seek(self, turn):
+        # Moves to the match as it was after `turn` recorded turns
+        turn = max(0, min(turn, len(self.records)))
+        index = min(turn // self.keyframe_interval, len(self.keyframes) - 1)
+        start = index * self.keyframe_interval
+        if not start <= self.turn <= turn:
+            self.restore(self.keyframes[index], start)
+        while self.turn < turn:
+            self.step()
+
+    def play(self):
+        self.seek(len(self.records))
+        return self.sim
+
+def load_replay(path, keyframe_interval=REPLAY_KEYFRAME_INTERVAL):
+    with open(path, 'rb') as f:
+        return Replay(f.read(), keyframe_interval)
+
+def replay_paths(paths):
+    for path in paths:
+        if os.path.isdir(path):
+            yield from sorted(os.path.join(path, name) for name in os.listdir(path) if name.endswith('.replay'))
+        else:
+            yield path
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-simulate recorded matches and check them against the current rules")
+    parser.add_argument("paths", nargs="+", help="replay files, or directories of them")
+    parser.add_argument("--turn", type=int, default=None, help="stop at this turn and print the match")
+    args = parser.parse_args()
+
+    replays = turns = 0
+    failed = []
+    start = time.perf_counter()
+    for path in replay_paths(args.paths):
+        replay = load_replay(path)
+        try:
+            if args.turn is None:
+                sim = replay.play()
+            else:
+                replay.seek(args.turn)
+                sim = replay.sim
+        except ReplayMismatch as e:
+            failed.append((path, e))
+            continue
+        replays += 1
+        turns += replay.turn
+        if args.turn is not None:
+            scores = [p.score for p in sim.players]
+            lives = [p.lives for p in sim.players]
+            print(f"{path}: turn {replay.turn}/{len(replay.records)}  scores {scores}  lives {lives}  "
+                  f"ghost {(sim.ghost.x, sim.ghost.y)}  coins left {sim.board.coins_left()}")
+    elapsed = time.perf_counter() - start
+
+    for path, e in failed:
+        print(f"MISMATCH {path}: {e}")
+    print(f"{replays} replays matched, {len(failed)} diverged, {turns} turns in {elapsed:.2f}s "
+          f"({turns / max(elapsed, 1e-9):.0f} turns/s)")
+    if failed:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,520 @@
+import math
+import random
+import time
+from board import EMPTY, OBSTACLE, COIN, MAGNET, UNREACHABLE, STEPS
+
+WIN = 100000
+INF = float('inf')
+GHOST_RETARGET = 0.3  # Ghost.move picks a random target this often
+MAGNET_MOVES = 3  # moves a picked up magnet lasts, as in Player.move
+MAX_HASHED_LIVES = 8
+
+EXACT, LOWER, UPPER = 0, 1, 2
+
+UCT_EXPLORATION = 1.4
+ROLLOUT_PLIES = 40  # rollouts past this are scored by SearchState.evaluate
+ROLLOUT_GREEDY = 0.5  # chance a rollout move walks down the coin field instead of at random
+# Tiles the ghost's route search may reach on boards without a next-hop table; a farther
+# ghost walks straight at its target instead, so one search step costs at most this much
+GHOST_ROUTE_TILES = 400
+
+class SearchTimeout(Exception):
+    pass
+
+_zobrist_tables = {}
+
+def zobrist_keys(tiles):
+    # Fixed random bitstrings per board size, shared by every search on that size
+    keys = _zobrist_tables.get(tiles)
+    if keys is None:
+        rng = random.Random(tiles)
+        bits = lambda n: [rng.getrandbits(64) for _ in range(n)]
+        keys = {
+            'coin': bits(tiles),
+            'magnet': bits(tiles),
+            'player': [bits(tiles), bits(tiles)],
+            'score': [bits(tiles + 1), bits(tiles + 1)],
+            'lives': [bits(MAX_HASHED_LIVES), bits(MAX_HASHED_LIVES)],
+            'magnet_left': [bits(MAGNET_MOVES + 1), bits(MAGNET_MOVES + 1)],
+            'ghost': bits(tiles),
+            'counter': bits(8),
+            'target': bits(2),
+            'invulnerable': bits(3),
+            'turn': bits(2),
+        }
+        _zobrist_tables[tiles] = keys
+    return keys
+
+class SearchState:
+    # Compact copy of a Simulation that the search mutates in place and undoes.
+    # Invulnerability never runs out inside the search horizon and the ghost's
+    # fallback step ignores its shuffle; both are close enough for a few plies.
+    __slots__ = ('board', 'size', 'grid', 'pos', 'score', 'lives', 'magnet_left', 'radius', 'spawn',
+                 'ghost', 'counter', 'delay', 'target', 'invulnerable', 'turn', 'coins_left', 'keys', 'hash')
+
+    def __init__(self, sim):
+        board = sim.board
+        self.board = board
+        self.size = size = board.size
+        self.grid = bytearray(board.grid)
+        players = sim.players
+        self.pos = [p.position[0] * size + p.position[1] for p in players]
+        self.score = [p.score for p in players]
+        self.lives = [p.lives for p in players]
+        self.magnet_left = [p.magnet_moves_left if p.magnet_active else 0 for p in players]
+        self.radius = [p.magnet_radius for p in players]
+        self.spawn = [x * size + y for x, y in (sim.spawn_position(p) for p in players)]
+        ghost = sim.ghost
+        self.ghost = ghost.x * size + ghost.y
+        self.counter = ghost.moves_counter
+        self.delay = ghost.move_delay
+        self.target = ghost.target_player
+        self.invulnerable = players.index(sim.invulnerable_player) if sim.invulnerable_player else -1
+        self.turn = sim.current_player
+        self.coins_left = board.coins_left()
+        self.keys = zobrist_keys(size * size)
+        self.hash = self.full_hash()
+
+    def full_hash(self):
+        keys = self.keys
+        h = 0
+        for i, code in enumerate(self.grid):
+            if code == COIN:
+                h ^= keys['coin'][i]
+            elif code == MAGNET:
+                h ^= keys['magnet'][i]
+        for p in range(2):
+            h ^= keys['player'][p][self.pos[p]]
+            h ^= keys['score'][p][self.score[p]]
+            h ^= keys['lives'][p][self.hashed_lives(p)]
+            h ^= keys['magnet_left'][p][self.magnet_left[p]]
+        h ^= keys['ghost'][self.ghost] ^ keys['counter'][self.counter] ^ keys['target'][self.target]
+        h ^= keys['invulnerable'][self.invulnerable + 1] ^ keys['turn'][self.turn]
+        return h
+
+    def hashed_lives(self, p):
+        return max(0, min(self.lives[p], MAX_HASHED_LIVES - 1))
+
+    def moves(self):
+        # (direction index, destination tile) pairs for the player to move
+        size = self.size
+        x, y = divmod(self.pos[self.turn], size)
+        moves = []
+        for i, (dx, dy) in enumerate(STEPS):
+            nx, ny = x + dx, y + dy
+            if 0 <= nx < size and 0 <= ny < size and self.grid[nx * size + ny] != OBSTACLE:
+                moves.append((i, nx * size + ny))
+        return moves
+
+    def play(self, dest):
+        # The mover's half of Simulation.step, returns what undo_play needs
+        p = self.turn
+        keys = self.keys
+        grid = self.grid
+        removed = []
+        undo = (p, self.pos[p], self.score[p], self.magnet_left[p], self.coins_left, self.hash, removed)
+        h = self.hash ^ keys['player'][p][self.pos[p]] ^ keys['player'][p][dest]
+        self.pos[p] = dest
+        score = self.score[p]
+        left = self.magnet_left[p]
+
+        tile = grid[dest]
+        if tile == MAGNET:
+            grid[dest] = EMPTY
+            removed.append((dest, MAGNET))
+            h ^= keys['magnet'][dest]
+            left = MAGNET_MOVES
+        elif tile == COIN:
+            grid[dest] = EMPTY
+            removed.append((dest, COIN))
+            h ^= keys['coin'][dest]
+            score += 1
+
+        if left:
+            size = self.size
+            radius = self.radius[p]
+            x, y = divmod(dest, size)
+            for cx in range(max(0, x - radius), min(size, x + radius + 1)):
+                for i in range(cx * size + max(0, y - radius), cx * size + min(size, y + radius + 1)):
+                    if grid[i] == COIN:
+                        grid[i] = EMPTY
+                        removed.append((i, COIN))
+                        h ^= keys['coin'][i]
+                        score += 1
+            left -= 1
+
+        self.coins_left -= score - self.score[p]
+        h ^= keys['score'][p][self.score[p]] ^ keys['score'][p][score]
+        h ^= keys['magnet_left'][p][self.magnet_left[p]] ^ keys['magnet_left'][p][left]
+        self.score[p] = score
+        self.magnet_left[p] = left
+        self.hash = h
+        return undo
+
+    def undo_play(self, undo):
+        p, pos, score, left, coins_left, h, removed = undo
+        for i, code in removed:
+            self.grid[i] = code
+        self.pos[p] = pos
+        self.score[p] = score
+        self.magnet_left[p] = left
+        self.coins_left = coins_left
+        self.hash = h
+
+    def ghost_outcomes(self):
+        # [(probability, target)] when the ghost steps after this move, None when it waits
+        if self.counter + 1 < self.delay:
+            return None
+        stay = 1 - GHOST_RETARGET / 2
+        return [(stay, self.target), (1 - stay, 1 - self.target)]
+
+    def advance(self, target=None):
+        # The ghost's half of Simulation.step: ghost move, collisions, turn switch
+        keys = self.keys
+        undo = (self.ghost, self.counter, self.target, self.pos[:], self.lives[:],
+                self.invulnerable, self.turn, self.hash)
+        h = self.hash ^ keys['counter'][self.counter] ^ keys['target'][self.target] ^ keys['ghost'][self.ghost]
+        if target is None:
+            self.counter += 1
+        else:
+            self.counter = 0
+            self.target = target
+            self.ghost = self.ghost_step(self.pos[target])
+        h ^= keys['counter'][self.counter] ^ keys['target'][self.target] ^ keys['ghost'][self.ghost]
+
+        for p in range(2):
+            if self.pos[p] == self.ghost and p != self.invulnerable:
+                h ^= keys['lives'][p][self.hashed_lives(p)] ^ keys['player'][p][self.pos[p]]
+                self.lives[p] -= 1
+                self.pos[p] = self.spawn[p]
+                h ^= keys['lives'][p][self.hashed_lives(p)] ^ keys['player'][p][self.pos[p]]
+                h ^= keys['invulnerable'][self.invulnerable + 1] ^ keys['invulnerable'][p + 1]
+                self.invulnerable = p
+
+        h ^= keys['turn'][self.turn] ^ keys['turn'][1 - self.turn]
+        self.turn = 1 - self.turn
+        self.hash = h
+        return undo
+
+    def undo_advance(self, undo):
+        (self.ghost, self.counter, self.target, self.pos, self.lives,
+         self.invulnerable, self.turn, self.hash) = undo
+
+    def ghost_step(self, dest):
+        size = self.size
+        x, y = divmod(self.ghost, size)
+        tx, ty = divmod(dest, size)
+        step = self.board.next_hop(x, y, tx, ty, GHOST_ROUTE_TILES)
+        if step:
+            return (x + step[0]) * size + y + step[1]
+        best = self.ghost
+        best_dist = INF
+        for dx, dy in STEPS:
+            nx, ny = x + dx, y + dy
+            if 0 <= nx < size and 0 <= ny < size and self.grid[nx * size + ny] != OBSTACLE:
+                dist = abs(nx - tx) + abs(ny - ty)
+                if dist < best_dist:
+                    best = nx * size + ny
+                    best_dist = dist
+        return best
+
+    def is_terminal(self):
+        return self.coins_left == 0 or self.lives[0] <= 0 or self.lives[1] <= 0
+
+    def terminal_value(self, me):
+        # Same order as Simulation.check_game_end: lives are only checked while coins remain
+        if self.coins_left:
+            loser = 0 if self.lives[0] <= 0 else 1
+            return -WIN if loser == me else WIN
+        diff = self.score[me] - self.score[1 - me]
+        if diff == 0:
+            return 0
+        return WIN + diff if diff > 0 else -WIN + diff
+
+    def evaluate(self, me, coin_field):
+        # Heuristic value of a non-terminal state for player me, in coins times ten
+        opp = 1 - me
+        value = 10 * (self.score[me] - self.score[opp])
+        # Lives only decide the match once they run out, the terminal value covers that
+        value += 8 * (self.lives[me] - self.lives[opp])
+        value += 3 * (self.magnet_left[me] - self.magnet_left[opp])
+        value -= self.distance(coin_field, self.pos[me]) - self.distance(coin_field, self.pos[opp])
+
+        # Standing next to the ghost risks a life and a walk back from spawn
+        size = self.size
+        gx, gy = divmod(self.ghost, size)
+        for p, sign in ((me, -1), (opp, 1)):
+            if p == self.invulnerable:
+                continue
+            x, y = divmod(self.pos[p], size)
+            if abs(x - gx) + abs(y - gy) <= 1:
+                value += sign * 5
+        return value
+
+    def distance(self, field, tile):
+        dist = field[tile]
+        return self.size if dist == UNREACHABLE else min(dist, self.size)
+
+class ExpectimaxSearch:
+    # Alpha-beta over the two players, expectation over the ghost's retargeting
+    def __init__(self, state, me, deadline=None, cancelled=None):
+        self.state = state
+        self.me = me
+        self.deadline = deadline
+        self.cancelled = cancelled
+        self.table = {}
+        self.nodes = 0
+        self.depth = 0
+        # Coin distances at the root steer the evaluation and move ordering
+        self.coin_field = state.board.distance_field(COIN)
+
+    def run(self, max_depth, on_depth=None):
+        # Iterative deepening, on_depth(depth, move, value) after each finished depth
+        best = None
+        for depth in range(1, max_depth + 1):
+            try:
+                value, move = self.search_root(depth, best)
+            except SearchTimeout:
+                break
+            if move is None:
+                break
+            best = move
+            self.depth = depth
+            if on_depth:
+                on_depth(depth, move, value)
+            if abs(value) >= WIN:
+                break
+        return best
+
+    def out_of_time(self):
+        if self.cancelled is not None and self.cancelled():
+            return True
+        return self.deadline is not None and time.monotonic() >= self.deadline
+
+    def search_root(self, depth, previous):
+        state = self.state
+        alpha = -INF
+        best_move = None
+        for move, dest in self.ordered(state.moves(), previous):
+            undo = state.play(dest)
+            value = self.after_move(depth, alpha, INF)
+            state.undo_play(undo)
+            if best_move is None or value > alpha:
+                alpha = value
+                best_move = move
+        return alpha, best_move
+
+    def ordered(self, moves, first):
+        # Previous best move first, then moves that get closer to a coin
+        field = self.coin_field
+        size = self.state.size
+        moves.sort(key=lambda m: (m[0] != first, field[m[1]] if field[m[1]] != UNREACHABLE else size * size))
+        return moves
+
+    def value(self, depth, alpha, beta):
+        self.nodes += 1
+        if self.nodes & 15 == 0 and self.out_of_time():
+            raise SearchTimeout()
+        state = self.state
+        if state.is_terminal():
+            return state.terminal_value(self.me)
+        if depth == 0:
+            return self.state.evaluate(self.me, self.coin_field)
+
+        key = state.hash
+        entry = self.table.get(key)
+        first = None
+        if entry is not None:
+            stored_depth, stored, flag, first = entry
+            if stored_depth >= depth:
+                if flag == EXACT:
+                    return stored
+                if flag == LOWER:
+                    alpha = max(alpha, stored)
+                else:
+                    beta = min(beta, stored)
+                if alpha >= beta:
+                    return stored
+
+        moves = state.moves()
+        if not moves:
+            return self.state.evaluate(self.me, self.coin_field)
+
+        maximizing = state.turn == self.me
+        window = alpha, beta
+        best = -INF if maximizing else INF
+        best_move = None
+        for move, dest in self.ordered(moves, first):
+            undo = state.play(dest)
+            value = self.after_move(depth, alpha, beta)
+            state.undo_play(undo)
+            if maximizing:
+                if value > best:
+                    best, best_move = value, move
+                alpha = max(alpha, value)
+            else:
+                if value < best:
+                    best, best_move = value, move
+                beta = min(beta, value)
+            if alpha >= beta:
+                break
+
+        if best <= window[0]:
+            flag = UPPER
+        elif best >= window[1]:
+            flag = LOWER
+        else:
+            flag = EXACT
+        self.table[key] = (depth, best, flag, best_move)
+        return best
+
+    def after_move(self, depth, alpha, beta):
+        state = self.state
+        outcomes = state.ghost_outcomes()
+        if outcomes is None:
+            undo = state.advance()
+            value = self.value(depth - 1, alpha, beta)
+            state.undo_advance(undo)
+            return value
+
+        # Chance node: an expectation needs exact child values, so no window
+        total = 0
+        for probability, target in outcomes:
+            undo = state.advance(target)
+            total += probability * self.value(depth - 1, -INF, INF)
+            state.undo_advance(undo)
+        return total
+
+class TreeNode:
+    # Open-loop MCTS node: the moves that lead here, whatever the ghost did on the way
+    __slots__ = ('player', 'children', 'visits', 'wins')
+
+    def __init__(self, player=None):
+        self.player = player  # who moved into this node, None at the root
+        self.children = {}
+        self.visits = 0
+        self.wins = 0.0
+
+    def uct(self, log_parent):
+        return self.wins / self.visits + UCT_EXPLORATION * math.sqrt(log_parent / self.visits)
+
+class MonteCarloSearch:
+    # UCT over the players' moves, the ghost is sampled on the way down and in rollouts
+    def __init__(self, state, me, rng, deadline=None, cancelled=None):
+        self.state = state
+        self.me = me
+        self.rng = rng
+        self.deadline = deadline
+        self.cancelled = cancelled
+        self.root = TreeNode()
+        self.playouts = 0
+        self.elapsed = 0.0
+        self.coin_field = state.board.distance_field(COIN)
+
+    def out_of_time(self):
+        if self.cancelled is not None and self.cancelled():
+            return True
+        return self.deadline is not None and time.monotonic() >= self.deadline
+
+    def run(self, max_playouts=None, on_progress=None, progress_every=64):
+        # Playouts until the deadline or max_playouts, on_progress(move) every progress_every.
+        # A playout on a large board can take milliseconds, so the deadline is checked before each.
+        start = time.perf_counter()
+        while max_playouts is None or self.playouts < max_playouts:
+            if self.playouts and on_progress and self.playouts % progress_every == 0:
+                on_progress(self.best_move())
+            if self.out_of_time():
+                break
+            self.playout()
+        self.elapsed += time.perf_counter() - start
+        return self.best_move()
+
+    def visit_counts(self):
+        return {move: child.visits for move, child in self.root.children.items()}
+
+    def best_move(self):
+        counts = self.visit_counts()
+        if not counts:
+            return None
+        return max(counts, key=counts.get)
+
+    def playout(self):
+        state = self.state
+        undo = []
+        node = self.root
+        path = [node]
+
+        # Selection down to the first untried move, which is expanded
+        while not state.is_terminal():
+            moves = state.moves()
+            if not moves:
+                break
+            children = node.children
+            untried = [(move, dest) for move, dest in moves if move not in children]
+            if untried:
+                move, dest = self.rng.choice(untried)
+                node = children[move] = TreeNode(state.turn)
+                self.apply(dest, undo)
+                path.append(node)
+                break
+            log_parent = math.log(node.visits)
+            move, dest = max(moves, key=lambda m: children[m[0]].uct(log_parent))
+            node = children[move]
+            self.apply(dest, undo)
+            path.append(node)
+
+        result = self.rollout(undo)
+        for node in path:
+            node.visits += 1
+            node.wins += result if node.player == self.me else 1 - result
+
+        for restore, record in reversed(undo):
+            restore(record)
+        self.playouts += 1
+
+    def apply(self, dest, undo):
+        # Play dest, then let the ghost take one sampled step
+        state = self.state
+        undo.append((state.undo_play, state.play(dest)))
+        outcomes = state.ghost_outcomes()
+        target = None
+        if outcomes is not None:
+            stay, _ = outcomes[0]
+            target = outcomes[0][1] if self.rng.random() < stay else outcomes[1][1]
+        undo.append((state.undo_advance, state.advance(target)))
+
+    def rollout(self, undo):
+        state = self.state
+        grid = state.grid
+        field = self.coin_field
+        rng = self.rng
+        for _ in range(ROLLOUT_PLIES):
+            if state.is_terminal():
+                break
+            moves = state.moves()
+            if not moves:
+                break
+            # Grab an item next door, else head for coins or wander
+            dest = None
+            for _, tile in moves:
+                if grid[tile] == COIN or grid[tile] == MAGNET:
+                    dest = tile
+                    break
+            if dest is None:
+                if rng.random() < ROLLOUT_GREEDY:
+                    dest = min(moves, key=lambda m: state.distance(field, m[1]))[1]
+                else:
+                    dest = rng.choice(moves)[1]
+            self.apply(dest, undo)
+
+        if state.is_terminal():
+            value = state.terminal_value(self.me)
+            return 0.5 if value == 0 else 1.0 if value > 0 else 0.0
+        return 0.5 + 0.5 * math.tanh(state.evaluate(self.me, field) / 30)
+
+def root_parallel_visits(state, me, seed, budget_ms, max_playouts=None):
+    # Runs in a worker process: one independent tree, merged at the root by the caller
+    deadline = None if budget_ms is None else time.monotonic() + budget_ms / 1000
+    search = MonteCarloSearch(state, me, random.Random(seed), deadline)
+    search.run(max_playouts)
+    return search.visit_counts(), search.playouts, search.elapsed
@@ -0,0 +1,211 @@
+import copy
+import random
+import struct
+import time
+from board import Board, EMPTY
+from constants import INVULNERABLE_TIME
+from entities import Ghost
+
+# Packed match state: this header followed by the board grid. Per player x, y, score, lives,
+# magnet moves left and magnet active, then ghost x, y, counter and target, then the current
+# player, invulnerable and losing player (-1 for none), turns and invulnerable_time.
+PACKED_HEADER = struct.Struct('<' + 'HHIbB?' * 2 + 'HHBB' + 'Bbbiq')
+
+def match_generators(seed, players=2):
+    # The match generator drives the board and the ghost, each player draws from its own.
+    # Player choices then never shift the ghost's draws, so a seed and the moves replay a match.
+    rng = random.Random(seed)
+    return rng, [random.Random(rng.getrandbits(64)) for _ in range(players)]
+
+class SystemClock:
+    # Milliseconds since the clock was created, like pygame.time.get_ticks()
+    def __init__(self):
+        self._start = time.monotonic()
+
+    def now(self):
+        return int((time.monotonic() - self._start) * 1000)
+
+class StepClock:
+    # Simulated clock that only moves when advanced, for headless matches
+    def __init__(self, step_ms=0):
+        self.step_ms = step_ms
+        self._now = 0
+
+    def now(self):
+        return self._now
+
+    def advance(self, ms=None):
+        self._now += self.step_ms if ms is None else ms
+        return self._now
+
+class Simulation:
+    def __init__(self, players, board=None, clock=None, rng=None):
+        self.board = board if board is not None else Board()
+        # Shares the board's generator unless the match provides one
+        self.rng = rng if rng is not None else self.board.rng
+        self.players = players
+        self.clock = clock if clock is not None else SystemClock()
+        self.current_player = 0
+        self.losing_player = None
+        self.turns = 0
+
+        self.ghost = self.spawn_ghost()
+
+        self.invulnerable_time = 0
+        self.invulnerable_player = None
+
+    def snapshot(self):
+        # Copy of the match for a worker thread, the main loop keeps playing the original
+        sim = copy.copy(self)
+        sim.board = self.board.snapshot()
+        sim.players = [copy.copy(player) for player in self.players]
+        sim.ghost = copy.copy(self.ghost)
+        for name in ('invulnerable_player', 'losing_player'):
+            player = getattr(self, name)
+            if player is not None:
+                setattr(sim, name, sim.players[self.players.index(player)])
+        return sim
+
+    def pack(self):
+        # The match as one bytes object, hashable and copied for free; facing is left out
+        values = []
+        for player in self.players:
+            x, y = player.position
+            values += (x, y, player.score, player.lives, player.magnet_moves_left, player.magnet_active)
+        ghost = self.ghost
+        values += (ghost.x, ghost.y, ghost.moves_counter, ghost.target_player, self.current_player,
+                   self.player_index(self.invulnerable_player), self.player_index(self.losing_player),
+                   self.turns, self.invulnerable_time)
+        return PACKED_HEADER.pack(*values) + self.board.grid
+
+    def unpack(self, packed):
+        # Returns the match to a state from pack() of this match
+        values = PACKED_HEADER.unpack_from(packed)
+        for i, player in enumerate(self.players):
+            x, y, score, lives, magnet_moves_left, magnet_active = values[i * 6:i * 6 + 6]
+            player.position = (x, y)
+            player.score = score
+            if lives > player.lives:
+                player.add_life(lives - player.lives)
+            while player.lives > lives:
+                player.decrease_life()
+            player.magnet_moves_left = magnet_moves_left
+            player.magnet_active = magnet_active
+        ghost = self.ghost
+        (ghost.x, ghost.y, ghost.moves_counter, ghost.target_player, self.current_player,
+         invulnerable, losing, self.turns, self.invulnerable_time) = values[12:]
+        self.invulnerable_player = self.players[invulnerable] if invulnerable >= 0 else None
+        self.losing_player = self.players[losing] if losing >= 0 else None
+        self.board.load_grid(packed[PACKED_HEADER.size:])
+
+    def player_index(self, player):
+        return -1 if player is None else self.players.index(player)
+
+    def spawn_ghost(self):
+        inner = range(2, self.board.size - 2)
+        candidates = [(x, y) for x in inner for y in inner if self.board.tile(x, y) == EMPTY]
+        if not candidates:
+            # Every inner tile holds an item, settle for any open one
+            candidates = [(x, y) for x in inner for y in inner if not self.board.is_obstacle(x, y)]
+        if not candidates:
+            # Boards below MIN_BOARD_SIZE have no inner tiles, keep off the players' corners if possible
+            size = self.board.size
+            tiles = [(x, y) for x in range(size) for y in range(size) if not self.board.is_obstacle(x, y)]
+            candidates = [tile for tile in tiles if tile not in ((0, 0), (size - 1, size - 1))] or tiles
+        ghost_x, ghost_y = self.rng.choice(candidates)
+        return Ghost(ghost_x, ghost_y, self.rng)
+
+    def spawn_position(self, player):
+        if player.symbol == 'A':
+            return (0, 0)
+        return (self.board.size - 1, self.board.size - 1)
+
+    def tick(self):
+        if self.invulnerable_player and self.clock.now() - self.invulnerable_time > INVULNERABLE_TIME:
+            self.invulnerable_player = None
+
+    def step(self, move):
+        # Apply a move for the current player, returns True if the turn was taken
+        return self.make_move(move) is not None
+
+    def make_move(self, move):
+        # Plays a turn like step, returns an undo record for unmake or None if no turn was taken.
+        # The random generator is not rewound, so replaying after unmake can differ.
+        if not move:
+            return None
+
+        player = self.players[self.current_player]
+        player_undo = player.make_move(move, self.board)
+        if player_undo is None:
+            return None
+
+        ghost = self.ghost
+        undo = (
+            self.current_player,
+            player_undo,
+            (ghost.x, ghost.y, ghost.moves_counter, ghost.target_player),
+            [(p.position, p.facing, p.lives) for p in self.players],
+            self.invulnerable_player,
+            self.invulnerable_time,
+            self.losing_player,
+        )
+
+        ghost.move(self.players, self.board)
+        self.handle_ghost_collision()
+
+        self.current_player = 1 - self.current_player
+        self.turns += 1
+        return undo
+
+    def unmake(self, undo):
+        # Restores the match to how it was before the make_move that returned undo
+        (current_player, player_undo, ghost_state, player_states,
+         self.invulnerable_player, self.invulnerable_time, self.losing_player) = undo
+        ghost = self.ghost
+        ghost.x, ghost.y, ghost.moves_counter, ghost.target_player = ghost_state
+        for player, (position, facing, lives) in zip(self.players, player_states):
+            player.position = position
+            player.facing = facing
+            if player.lives < lives:
+                player.add_life(lives - player.lives)
+        self.players[current_player].unmake_move(player_undo, self.board)
+        self.current_player = current_player
+        self.turns -= 1
+
+    def handle_ghost_collision(self):
+        for player in self.players:
+            if (self.ghost.check_collision(player) and
+                player != self.invulnerable_player):
+                remaining_lives = player.decrease_life()
+                self.invulnerable_player = player
+                self.invulnerable_time = self.clock.now()
+
+                player.position = self.spawn_position(player)
+                if player.symbol == 'B':
+                    player.facing = 'left'
+
+                if remaining_lives <= 0:
+                    self.losing_player = player
+
+    def check_game_end(self):
+        if self.board.coins_left() == 0:
+            return True
+
+        # Runs out of lives
+        for player in self.players:
+            if player.lives <= 0:
+                self.losing_player = player
+                return True
+
+        return False
+
+    def winner(self):
+        # Index of the winning player, or None for a tie
+        if self.losing_player:
+            return 1 - self.players.index(self.losing_player)
+        player_a, player_b = self.players
+        if player_a.score > player_b.score:
+            return 0
+        if player_a.score < player_b.score:
+            return 1
+        return None
@@ -0,0 +1,44 @@
+from constants import CHUNK_SIZE
+
+class ChunkIndex:
+    # How many tiles of each non-empty type every CHUNK_SIZE x CHUNK_SIZE chunk holds, so region
+    # queries skip the chunks without any.
+    def __init__(self, size, types, chunk=CHUNK_SIZE):
+        self.size = size
+        self.chunk = chunk
+        self.chunks = -(-size // chunk)
+        cells = self.chunks * self.chunks
+        self.counts = {target: [0] * cells for target in types}
+
+    def build(self, grid):
+        size = self.size
+        for target in self.counts:
+            idx = grid.find(target)
+            while idx != -1:
+                self.add(target, *divmod(idx, size))
+                idx = grid.find(target, idx + 1)
+
+    def add(self, target, x, y):
+        chunk = self.chunk
+        self.counts[target][x // chunk * self.chunks + y // chunk] += 1
+
+    def remove(self, target, x, y):
+        chunk = self.chunk
+        self.counts[target][x // chunk * self.chunks + y // chunk] -= 1
+
+    def remove_all(self, target, tiles):
+        chunk = self.chunk
+        chunks = self.chunks
+        counts = self.counts[target]
+        for x, y in tiles:
+            counts[x // chunk * chunks + y // chunk] -= 1
+
+    def bands_in(self, target, top, bottom, left, right):
+        # Chunk rows with a tile of type target in a chunk overlapping the region
+        chunk = self.chunk
+        chunks = self.chunks
+        counts = self.counts[target]
+        first = left // chunk
+        end = -(-right // chunk)
+        return [cx for cx in range(top // chunk, -(-bottom // chunk))
+                if any(counts[cx * chunks + first:cx * chunks + end])]
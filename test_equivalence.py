@@ -0,0 +1,385 @@
+import os
+import random
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+import pygame
+import pytest
+from bench import (OpenBoard, legacy_bfs_move, legacy_collect_coins_in_radius, legacy_draw_items, legacy_generate,
+                   sprite_cache)
+from board import Board, Coin, EMPTY, COIN, MAGNET, OBSTACLE
+from camera import Camera
+from constants import HEADLESS_TURN_TIME, HUD_HEIGHT, TILE_SIZE, WHITE
+from entities import AIPlayer, RandomPlayer
+from headless import run_match
+from profiler import Profiler
+from renderer import Renderer
+from replay import ReplayRecorder, load_replay
+from simulation import Simulation, StepClock
+
+# The optimized board and match paths, checked against the code they replaced or a plain recomputation
+
+def grid_tiles(board, target):
+    return sorted(divmod(i, board.size) for i, tile in enumerate(board.grid) if tile == target)
+
+@pytest.mark.parametrize("size", [8, 9, 16])
+def test_grid_matches_the_items(size):
+    rng = random.Random(size)
+    board = Board(size, rng=rng)
+    assert grid_tiles(board, OBSTACLE) == sorted(board.obstacles)
+    for _ in range(40):
+        x, y = rng.randrange(size), rng.randrange(size)
+        board.remove_coin(x, y)
+        board.remove_magnet(y, x)
+        board.collect_coins_in_radius(y, x, 1)
+        assert grid_tiles(board, COIN) == sorted(board.coins)
+        assert grid_tiles(board, MAGNET) == sorted(board.magnets)
+
+@pytest.mark.parametrize("radius", [1, 3])
+def test_magnet_collection_matches_list_scan(radius):
+    rng = random.Random(radius)
+    board = OpenBoard(64, coin_prob=0.9, magnet_prob=0.0, rng=rng)
+    coins = [Coin(c.x, c.y) for c in board.coins.values()]
+    for _ in range(200):
+        x, y = rng.randrange(64), rng.randrange(64)
+        expected = legacy_collect_coins_in_radius(coins, x, y, radius)
+        assert sorted((c.x, c.y) for c in board.collect_coins_in_radius(x, y, radius)) == \
+            sorted((c.x, c.y) for c in expected)
+    assert sorted(board.coins) == sorted((c.x, c.y) for c in coins)
+
+@pytest.mark.parametrize("size", [8, 16, 32])
+def test_ai_moves_match_path_copying_bfs(size):
+    for seed in range(10):
+        rng = random.Random(seed)
+        board = Board(size, coin_prob=0.005, magnet_prob=0.001, rng=rng)
+        # Items are picked up on arrival, so a player only ever stands on an empty tile
+        free = [(x, y) for x in range(size) for y in range(size) if board.tile(x, y) == EMPTY]
+        player = AIPlayer('B', 0, 0, rng)
+        for position in rng.sample(free, min(10, len(free))):
+            player.position = position
+            for target, name in ((COIN, 'coin'), (MAGNET, 'magnet')):
+                assert player.step_towards(board, target) == legacy_bfs_move(board, position, [name]), \
+                    f"seed {seed} at {position}"
+
+def new_match(size, seed):
+    rng = random.Random(seed)
+    board = Board(size, rng=rng)
+    players = [AIPlayer('A', 0, 0, rng), AIPlayer('B', size - 1, size - 1, rng)]
+    return Simulation(players, board, StepClock(HEADLESS_TURN_TIME), rng), rng
+
+def play(sim, max_turns, before_move=None):
+    # Greedy moves until the match ends, calling before_move(player) ahead of each one
+    while not sim.check_game_end() and sim.turns < max_turns:
+        sim.clock.advance()
+        sim.tick()
+        player = sim.players[sim.current_player]
+        if before_move is not None:
+            before_move(player)
+        if not sim.step(player.get_move(sim.board)):
+            sim.current_player = 1 - sim.current_player
+        yield sim
+
+def match_state(sim):
+    board = sim.board
+    return (
+        bytes(board.grid), sorted(board.coins), sorted(board.magnets),
+        None if board._index is None else board._index.counts,
+        {target: list(field) for target, field in board._fields.items()},
+        [(p.position, p.facing, p.score, p.lives, p.magnet_active, p.magnet_moves_left) for p in sim.players],
+        (sim.ghost.x, sim.ghost.y, sim.ghost.moves_counter, sim.ghost.target_player),
+        sim.invulnerable_player, sim.invulnerable_time, sim.losing_player, sim.current_player, sim.turns,
+    )
+
+@pytest.mark.parametrize("size", [8, 16, 32, 64])
+def test_repaired_fields_match_rebuilds(size):
+    for seed in range(3):
+        sim, rng = new_match(size, seed)
+        board = sim.board
+        while not sim.check_game_end() and sim.turns < 300:
+            sim.clock.advance()
+            sim.tick()
+            player = sim.players[sim.current_player]
+            # Mix in random moves so the players don't only eat the nearest coin
+            move = player.get_move(board) if rng.random() < 0.8 else rng.choice(player.available_moves(board) or [None])
+            if not sim.step(move):
+                sim.current_player = 1 - sim.current_player
+                continue
+            for target in (COIN, MAGNET):
+                field = board._fields.get(target)
+                assert field is None or field == board.compute_distance_field(target), \
+                    f"seed {seed}: field {target} after turn {sim.turns}"
+
+@pytest.mark.parametrize("size", [8, 16, 24])
+def test_next_hop_table_matches_bfs(size):
+    rng = random.Random(size)
+    board = Board(size, rng=rng)
+    free = [(x, y) for x in range(size) for y in range(size) if not board.is_obstacle(x, y)]
+    pairs = [(rng.choice(free), rng.choice(free)) for _ in range(500)]
+    table = board.next_hops
+    board.next_hops = None
+    expected = [board.next_hop(sx, sy, tx, ty) for (sx, sy), (tx, ty) in pairs]
+    board.next_hops = table
+    # Both searches expand neighbours in the same order, so they pick the same step
+    assert [board.next_hop(sx, sy, tx, ty) for (sx, sy), (tx, ty) in pairs] == expected
+
+def test_capped_routes_match_full_searches():
+    # A route search capped at some tiles finds the same step as a full one, or gives up
+    rng = random.Random(64)
+    board = Board(64, rng=rng)
+    free = [(x, y) for x in range(64) for y in range(64) if not board.is_obstacle(x, y)]
+    found = 0
+    for _ in range(200):
+        (sx, sy), (tx, ty) = rng.choice(free), rng.choice(free)
+        step = board.next_hop(sx, sy, tx, ty, 400)
+        assert step is None or step == board.next_hop(sx, sy, tx, ty)
+        found += step is not None
+    assert found
+
+@pytest.mark.parametrize("size", [8, 9, 32, 64])
+def test_generation_matches_list_based_boards(size):
+    for seed in range(3):
+        board = Board(size, rng=random.Random(seed))
+        obstacles, coins, magnets = legacy_generate(size, random.Random(seed))
+        assert sorted(obstacles) == sorted(board.obstacles)
+        assert sorted((c.x, c.y) for c in coins) == sorted(board.coins)
+        assert sorted((m.x, m.y) for m in magnets) == sorted(board.magnets)
+
+@pytest.mark.parametrize("size", [8, 16, 32])
+def test_unmake_restores_the_match(size):
+    for seed in range(3):
+        sim, rng = new_match(size, seed)
+        sim.board.distance_field(COIN)
+        sim.board.distance_field(MAGNET)
+
+        def explore(player):
+            before = match_state(sim)
+            for move in player.available_moves(sim.board):
+                sim.unmake(sim.make_move(move))
+                assert match_state(sim) == before, f"seed {seed}: unmake of {move} on turn {sim.turns}"
+
+        for _ in play(sim, 200, explore):
+            pass
+
+def test_unpack_restores_a_packed_match():
+    sim, rng = new_match(32, 0)
+    for _ in play(sim, 50):
+        pass
+    packed = sim.pack()
+    # Everything but facing, which pack() leaves out
+    before = match_state(sim)
+    for _ in play(sim, 100):
+        pass
+    sim.unpack(packed)
+    assert sim.pack() == packed
+    after = match_state(sim)
+    assert after[:4] == before[:4] and after[-6:] == before[-6:]
+    assert [p[:1] + p[2:] for p in after[-7]] == [p[:1] + p[2:] for p in before[-7]]
+
+def scan_items(board, target, top, bottom, left, right):
+    # Tiles of type target in a region, found by scanning its grid rows
+    found = []
+    for x in range(top, bottom):
+        for y in range(left, right):
+            if board.tile(x, y) == target:
+                found.append((x, y))
+    return found
+
+def check_index(board):
+    index = board.spatial_index()
+    for target in (OBSTACLE, COIN, MAGNET):
+        expected = scan_items(board, target, 0, board.size, 0, board.size)
+        assert sorted(board.items_in(target, 0, board.size, 0, board.size)) == expected
+        assert index is None or sum(index.counts[target]) == len(expected)
+    assert board.coins_left() == len(board.coins) == board.grid.count(COIN)
+
+@pytest.mark.parametrize("size", [16, 64])
+def test_spatial_index_follows_moves_and_rollbacks(size):
+    for seed in range(2):
+        sim, rng = new_match(size, seed)
+        board = sim.board
+        check_index(board)
+        packed = sim.pack()
+
+        def explore(player):
+            for move in player.available_moves(board):
+                sim.unmake(sim.make_move(move))
+                check_index(board)
+
+        for _ in play(sim, 100, explore):
+            check_index(board)
+        check_index(board.snapshot())
+        sim.unpack(packed)
+        check_index(board)
+
+@pytest.mark.parametrize("size", [16, 64, 128])
+@pytest.mark.parametrize("keep", [1.0, 0.02])
+def test_region_queries_match_grid_scans(size, keep):
+    rng = random.Random(size)
+    board = Board(size, rng=rng)
+    for x, y in list(board.coins):
+        if rng.random() >= keep:
+            board.remove_coin(x, y)
+    for _ in range(50):
+        top, left = rng.randrange(size), rng.randrange(size)
+        region = (top, min(size, top + rng.randint(1, 12)), left, min(size, left + rng.randint(1, 12)))
+        expected = scan_items(board, COIN, *region)
+        assert sorted(board.items_in(COIN, *region)) == expected
+
+def test_profiler_does_not_change_matches():
+    plain = [run_match(board_size=16, max_turns=200, seed=seed) for seed in range(5)]
+    profiler = Profiler()
+    profiler.install()
+    try:
+        profiled = [run_match(board_size=16, max_turns=200, seed=seed) for seed in range(5)]
+    finally:
+        profiler.uninstall()
+    assert plain == profiled
+    assert profiler.summary()['timers']
+
+@pytest.mark.parametrize("size", [8, 16])
+def test_replays_play_back_recorded_matches(tmp_path, size):
+    for seed in range(3):
+        path = tmp_path / f"{seed}.replay"
+        recorder = ReplayRecorder(str(path), seed, size)
+        result = run_match(board_size=size, max_turns=300, seed=seed, recorder=recorder)
+        recorder.close()
+
+        replay = load_replay(str(path), keyframe_interval=16)
+        sim = replay.play()
+        assert [p.score for p in sim.players] == result['scores']
+        assert [p.lives for p in sim.players] == result['lives']
+        end = match_state(sim)[:3]
+        # Seeking back restores a keyframe and replays from it
+        replay.seek(replay.turn // 3)
+        replay.seek(len(replay.records))
+        assert match_state(replay.sim)[:3] == end
+
+def batch_state(batch, i):
+    return (batch.pos[i].tolist(), batch.score[i].tolist(), batch.lives[i].tolist(), batch.magnet_left[i].tolist(),
+            batch.ghost[i].tolist(), int(batch.invulnerable[i]), int(batch.current[i]), int(batch.turns[i]),
+            batch.grid[i].tobytes())
+
+def scalar_state(sim):
+    return ([list(p.position) for p in sim.players], [p.score for p in sim.players], [p.lives for p in sim.players],
+            [p.magnet_moves_left if p.magnet_active else 0 for p in sim.players], [sim.ghost.x, sim.ghost.y],
+            sim.player_index(sim.invulnerable_player), sim.current_player, sim.turns, bytes(sim.board.grid))
+
+@pytest.mark.parametrize("size", [8, 16, 32])
+@pytest.mark.parametrize("player_types", [(AIPlayer, AIPlayer), (RandomPlayer, RandomPlayer), (AIPlayer, RandomPlayer)])
+def test_batch_steps_like_scalar_matches(size, player_types):
+    # Scalar matches and a batch stepped side by side with the same moves and ghost targets.
+    # Without a route the ghost breaks ties at random in both engines, so those games are
+    # copied over from the scalar match instead of compared.
+    np = pytest.importorskip("numpy")
+    from batch import BatchSimulation, NO_MOVE, setup_match
+    from entities import DIRECTIONS
+    games = 20
+    names = [name for name, dx, dy in DIRECTIONS]
+    sims = [setup_match(seed, size, player_types) for seed in range(games)]
+    batch = BatchSimulation(sims, 0)
+    while batch.active.any() and batch.turns.max() < 1000:
+        moves = np.full(games, NO_MOVE)
+        targets = np.zeros(games, dtype=int)
+        for i, sim in enumerate(sims):
+            if not batch.active[i]:
+                continue
+            sim.clock.advance()
+            sim.tick()
+            move = sim.players[sim.current_player].get_move(sim.board)
+            if move is not None:
+                moves[i] = names.index(move)
+            if not sim.step(move):
+                sim.current_player = 1 - sim.current_player
+                sim.turns += 1
+            targets[i] = sim.ghost.target_player
+        was_active = batch.active.copy()
+        batch.step(moves, targets)
+        for i in np.flatnonzero(was_active):
+            sim = sims[i]
+            if batch.stranded[i] and batch.ghost[i].tolist() != [sim.ghost.x, sim.ghost.y]:
+                batch.ghost[i] = (sim.ghost.x, sim.ghost.y)
+                batch.pos[i] = [p.position for p in sim.players]
+                batch.lives[i] = [p.lives for p in sim.players]
+                batch.invulnerable[i] = sim.player_index(sim.invulnerable_player)
+                batch.invulnerable_time[i] = sim.invulnerable_time
+                batch.losing[i] = sim.player_index(sim.losing_player)
+            else:
+                assert batch_state(batch, i) == scalar_state(sim), f"seed {i} on turn {sim.turns}"
+        batch.update_finished()
+    for sim in sims:
+        # Settles the loser when both players ran out of lives at once, as run_match does
+        sim.check_game_end()
+    assert [-1 if sim.winner() is None else sim.winner() for sim in sims] == batch.winners().tolist()
+
+@pytest.fixture
+def display():
+    pygame.init()
+    yield
+    pygame.quit()
+
+def test_atlas_draws_the_same_pixels_as_one_blit_each(display):
+    pygame.display.set_mode((1, 1))
+    # Distinct sprites, so a wrong atlas area shows up as different pixels
+    sprites = []
+    for color in ((200, 150, 0, 255), (90, 90, 90, 255), (200, 0, 200, 160)):
+        sprite = pygame.Surface((TILE_SIZE, TILE_SIZE), pygame.SRCALPHA)
+        pygame.draw.circle(sprite, color, (TILE_SIZE // 2, TILE_SIZE // 2), TILE_SIZE // 3)
+        sprites.append(sprite.convert_alpha())
+    coin, obstacle, magnet = sprites
+    cache = sprite_cache(coin)
+    cache.add_sprite('obstacle', obstacle)
+    cache.add_sprite('magnet', magnet)
+    atlas = cache.atlas()
+    for size in (8, 24):
+        board = Board(size, rng=random.Random(size))
+        screen = pygame.Surface((size * TILE_SIZE, size * TILE_SIZE)).convert()
+        screen.fill(WHITE)
+        legacy_draw_items(board, screen, coin, magnet, obstacle)
+        expected = pygame.image.tobytes(screen, 'RGB')
+
+        screen.fill(WHITE)
+        screen.blits([(atlas.surface, (y * TILE_SIZE, x * TILE_SIZE), atlas.areas['obstacle'])
+                      for (x, y) in board.obstacles], False)
+        board.draw(screen, atlas, Camera(size * TILE_SIZE, size * TILE_SIZE, size))
+        assert pygame.image.tobytes(screen, 'RGB') == expected
+
+def whole_board(board, sim, cache, tile):
+    # The board and everything on it drawn unscrolled at one tile size, to crop views from
+    camera = Camera(board.size * tile, board.size * tile, board.size, tile)
+    surface = pygame.Surface((board.size * tile, board.size * tile)).convert()
+    surface.fill(WHITE)
+    board.draw_static(surface, cache.atlas(tile), camera)
+    board.draw(surface, cache.atlas(tile), camera)
+    sim.ghost.draw(surface, cache.atlas(tile), camera)
+    for p in sim.players:
+        p.draw(surface, cache, camera)
+    return surface
+
+@pytest.mark.parametrize("size", [8, 32, 64])
+@pytest.mark.parametrize("follow_turn", [False, True])
+def test_dirty_frames_match_full_redraws(display, size, follow_turn):
+    view_tiles = 12
+    screen = pygame.display.set_mode((view_tiles * TILE_SIZE, view_tiles * TILE_SIZE + HUD_HEIGHT))
+    sprite = pygame.Surface((TILE_SIZE, TILE_SIZE), pygame.SRCALPHA)
+    pygame.draw.circle(sprite, (200, 150, 0, 255), (TILE_SIZE // 2, TILE_SIZE // 2), TILE_SIZE // 3)
+    cache = sprite_cache(sprite.convert_alpha())
+    renderer = Renderer(screen, pygame.font.Font(None, 24), cache)
+    sim, rng = new_match(size, size)
+    renderer.reset(sim.board, None if follow_turn else sim.players[0])
+    renderer.draw(sim)
+    view = renderer.view_rect
+    for frame, _ in enumerate(play(sim, 40)):
+        if frame % 10 == 9:
+            renderer.zoom(rng.choice((-1, 1)))
+        renderer.draw(sim)
+        dirty = pygame.image.tobytes(screen.subsurface(view), 'RGB')
+        renderer.invalidate()
+        renderer.draw(sim)
+        assert pygame.image.tobytes(screen.subsurface(view), 'RGB') == dirty, f"frame {frame}"
+
+        # The scrolled view is the matching window of the whole board
+        camera = renderer.camera
+        if frame % 10 == 0:
+            window = pygame.Rect(camera.left * camera.tile, camera.top * camera.tile, view.width, view.height)
+            window = window.clip(pygame.Rect(0, 0, size * camera.tile, size * camera.tile))
+            expected = whole_board(sim.board, sim, cache, camera.tile).subsurface(window)
+            assert pygame.image.tobytes(screen.subsurface(0, 0, window.width, window.height), 'RGB') == \
+                pygame.image.tobytes(expected, 'RGB'), f"frame {frame}"
@@ -0,0 +1,94 @@
+import argparse
+import itertools
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from board import board_size_arg
+from constants import BOARD_SIZE, MAX_TURNS
+from entities import AIPlayer, MCTSPlayer, RandomPlayer, SearchPlayer
+from headless import run_match
+
+PLAYER_TYPES = {
+    'ai': AIPlayer,
+    'random': RandomPlayer,
+    'search': SearchPlayer,
+    'mcts': MCTSPlayer,
+}
+
+def new_stats():
+    return {'games': 0, 'wins': [0, 0], 'ties': 0, 'scores': [0, 0], 'lives': [0, 0], 'turns': 0}
+
+def merge_stats(total, part):
+    total['games'] += part['games']
+    total['ties'] += part['ties']
+    total['turns'] += part['turns']
+    for i in range(2):
+        total['wins'][i] += part['wins'][i]
+        total['scores'][i] += part['scores'][i]
+        total['lives'][i] += part['lives'][i]
+
+def play_shard(pairing, seeds, board_size, max_turns):
+    # Runs in a worker process: plays one pairing over a slice of seeds
+    player_types = [PLAYER_TYPES[name] for name in pairing]
+    stats = new_stats()
+    for seed in seeds:
+        result = run_match(player_types, board_size, max_turns, seed)
+        stats['games'] += 1
+        stats['turns'] += result['turns']
+        if result['winner'] is None:
+            stats['ties'] += 1
+        else:
+            stats['wins'][result['winner']] += 1
+        for i in range(2):
+            stats['scores'][i] += result['scores'][i]
+            stats['lives'][i] += result['lives'][i]
+    return pairing, stats
+
+def run_tournament(players, games, board_size=BOARD_SIZE, max_turns=MAX_TURNS,
+                   workers=None, shard_size=50, first_seed=0):
+    # Every ordered pairing plays the same seeds, so seat order is compared fairly
+    pairings = list(itertools.product(players, repeat=2))
+    seeds = range(first_seed, first_seed + games)
+    shards = [seeds[i:i + shard_size] for i in range(0, games, shard_size)]
+    results = {pairing: new_stats() for pairing in pairings}
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(play_shard, pairing, shard, board_size, max_turns)
+                   for pairing in pairings for shard in shards]
+        for future in futures:
+            pairing, stats = future.result()
+            merge_stats(results[pairing], stats)
+    return results
+
+def print_results(results):
+    print(f"{'A':>8} {'B':>8} {'games':>6} {'A wins':>7} {'B wins':>7} {'ties':>5} "
+          f"{'A score':>8} {'B score':>8} {'A lives':>8} {'B lives':>8} {'turns':>6}")
+    for (name_a, name_b), stats in results.items():
+        games = stats['games']
+        print(f"{name_a:>8} {name_b:>8} {games:>6} {stats['wins'][0]:>7} {stats['wins'][1]:>7} {stats['ties']:>5} "
+              f"{stats['scores'][0] / games:>8.2f} {stats['scores'][1] / games:>8.2f} "
+              f"{stats['lives'][0] / games:>8.2f} {stats['lives'][1] / games:>8.2f} "
+              f"{stats['turns'] / games:>6.1f}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Play seeded headless matches between player types")
+    parser.add_argument("--players", nargs="+", choices=sorted(PLAYER_TYPES), default=['ai', 'random'])
+    parser.add_argument("--games", type=int, default=1000, help="seeds played by every pairing")
+    parser.add_argument("--size", type=board_size_arg, default=BOARD_SIZE)
+    parser.add_argument("--max-turns", type=int, default=MAX_TURNS)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--shard-size", type=int, default=50)
+    parser.add_argument("--first-seed", type=int, default=0)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    results = run_tournament(args.players, args.games, args.size, args.max_turns,
+                             args.workers, args.shard_size, args.first_seed)
+    elapsed = time.perf_counter() - start
+
+    print_results(results)
+    total = sum(stats['games'] for stats in results.values())
+    print(f"{total} matches on {args.workers} workers in {elapsed:.2f}s ({total / elapsed:.1f} matches/s)")
+
+if __name__ == "__main__":
+    main()
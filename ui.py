@@ -8,15 +8,20 @@ class Button:
         self.color = color
         self.hover_color = hover_color
         self.hovered = False
+        self._text_surf = None
+        self._text_font = None
         
     def draw(self, screen, font):
         color = self.hover_color if self.hovered else self.color
         pygame.draw.rect(screen, color, self.rect, border_radius=10)
         pygame.draw.rect(screen, BLACK, self.rect, 3, border_radius=10)
         
-        text_surf = font.render(self.text, True, BLACK)
-        text_rect = text_surf.get_rect(center=self.rect.center)
-        screen.blit(text_surf, text_rect)
+        # The label never changes, render it once per font
+        if self._text_font is not font:
+            self._text_surf = font.render(self.text, True, BLACK)
+            self._text_font = font
+        text_rect = self._text_surf.get_rect(center=self.rect.center)
+        screen.blit(self._text_surf, text_rect)
         
     def check_hover(self, pos):
         self.hovered = self.rect.collidepoint(pos)
@@ -0,0 +1,53 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+class MoveRequest:
+    # Shared between the main loop and the worker: the worker keeps best_move
+    # up to date and stops once the request has expired
+    def __init__(self, budget_ms, fallback=None):
+        self.deadline = time.monotonic() + budget_ms / 1000
+        self.best_move = None
+        self.fallback = fallback
+        self.cancelled = False
+
+    def expired(self):
+        return self.cancelled or time.monotonic() >= self.deadline
+
+def think(player, sim, request):
+    player.search_move(sim, request)
+
+class MoveWorker:
+    # Computes AI moves on a background thread so a slow search never stalls a frame
+    def __init__(self):
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ai")
+        self.request = None
+        self.future = None
+
+    def start(self, player, sim, budget_ms):
+        self.cancel()
+        moves = player.available_moves(sim.board)
+        self.request = MoveRequest(budget_ms, moves[0] if moves else None)
+        # The worker gets its own copy, the main loop keeps mutating the real match
+        self.future = self.executor.submit(think, player, sim.snapshot(), self.request)
+
+    def poll(self):
+        # (True, move) once the search finished or ran out of time, (False, None) while thinking
+        if self.future is None:
+            return True, None
+        if self.future.done():
+            self.future.result()  # re-raise anything the search raised
+        elif not self.request.expired():
+            return False, None
+        request = self.request
+        self.cancel()
+        return True, request.best_move if request.best_move is not None else request.fallback
+
+    def cancel(self):
+        if self.request is not None:
+            self.request.cancelled = True
+        self.request = None
+        self.future = None
+
+    def shutdown(self):
+        self.cancel()
+        self.executor.shutdown(wait=False, cancel_futures=True)